@@ -0,0 +1,55 @@
+import time
+started = time.perf_counter()
+
+import pygame
+
+import calibration
+import game
+import menu
+from config import load_config
+from resources import Resources
+
+
+class App:
+    # Runs every screen in one process. Scenes return the name of the next
+    # scene; the model, camera and board live in self.resources and are
+    # warmed up in the background while the menu is showing.
+    def __init__(self, config):
+        self.resources = Resources(config, started)
+        self.resources.record("imports", started)
+        self.scenes = {
+            "menu": self.menu_scene,
+            "game": self.game_scene,
+            "calibration": self.calibration_scene,
+            "stats": self.stats_scene,
+        }
+
+    def menu_scene(self):
+        return menu.run_menu(self.resources)
+
+    def game_scene(self):
+        game.run_game(self.resources, menu.difficulty_level, menu.num_drones)
+        return "menu"
+
+    def calibration_scene(self):
+        calibration.main(self.resources)
+        return "menu"
+
+    def stats_scene(self):
+        menu.view_stats(self.resources.config["results_db"])
+        return "menu"
+
+    def run(self, scene="menu"):
+        self.resources.warm_up()
+        while scene in self.scenes:
+            scene = self.scenes[scene]()
+        self.resources.close()
+        pygame.quit()
+
+
+def main():
+    App(load_config()).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+import argparse
+import math
+import time
+
+import cv2
+import numpy as np
+
+from capture import CapturedFrame, SyntheticSource
+from servo import MockBoard, ServoChannel
+from servo_map import ServoMap
+
+# Servo limits used by the manual calibration.
+ANGLE_RANGE_X = (52, 110)
+ANGLE_RANGE_Y = (52, 80)
+# Weights of the B, G, R brightness increase that make up the dot score.
+DOT_WEIGHTS = (0.2, 0.3, 0.5)
+
+
+def find_laser_dot(frame, background, min_score=40, radius=6):
+    # The laser dot as the strongest brightness increase over the laser-off
+    # background, red weighted. Returns the sub-pixel centroid of the score
+    # around the peak and the peak score, or None when nothing stands out.
+    diff = cv2.subtract(frame, background)
+    score = cv2.transform(diff, np.array([DOT_WEIGHTS], dtype=np.float32))
+    score = cv2.GaussianBlur(score, (5, 5), 0)
+    _, peak, _, (px, py) = cv2.minMaxLoc(score)
+    if peak < min_score:
+        return None
+    h, w = score.shape
+    x0, y0 = max(px - radius, 0), max(py - radius, 0)
+    window = score[y0:min(py + radius + 1, h), x0:min(px + radius + 1, w)]
+    weights = np.clip(window - peak / 2, 0, None)
+    total = weights.sum()
+    ys, xs = np.indices(weights.shape)
+    return x0 + (weights * xs).sum() / total, y0 + (weights * ys).sum() / total, peak
+
+
+def sweep_angles(grid, range_x=ANGLE_RANGE_X, range_y=ANGLE_RANGE_Y):
+    # Row by row, alternating direction, so the turret never jumps across
+    # the whole range between samples.
+    cols, rows = grid
+    xs = np.linspace(*range_x, cols).round().astype(int).tolist()
+    ys = np.linspace(*range_y, rows).round().astype(int).tolist()
+    return [(x, y) for row, y in enumerate(ys) for x in (xs if row % 2 == 0 else xs[::-1])]
+
+
+class TimedPin:
+    # Records when each write has gone out to the pin.
+    def __init__(self, pin):
+        self.pin = pin
+        self.writes = []
+
+    def write(self, value):
+        self.pin.write(value)
+        self.writes.append((time.time(), value))
+
+
+class AutoCalibrator:
+    # Sweeps the servos over a grid of angles with the laser on and finds the
+    # dot in the camera frames. A sample is taken once the dot has stayed
+    # within stable_px for stable_time seconds (and at least stable_frames
+    # frames); the time from the servo pin write to the start of that still
+    # period is the settle time. servo_pins are the TimedPins the channel
+    # writes to. The screen-to-servo model is then fitted to every sample.
+    def __init__(self, camera, servo_channel, grid=(15, 9), range_x=ANGLE_RANGE_X, range_y=ANGLE_RANGE_Y,
+                 stable_time=0.05, stable_frames=2, stable_px=0.75, move_px=3.0, timeout=1.0, min_score=40,
+                 window_name=None, servo_pins=()):
+        self.camera = camera
+        self.servo_channel = servo_channel
+        self.servo_pins = servo_pins
+        self.angles = sweep_angles(grid, range_x, range_y)
+        self.stable_time = stable_time
+        self.stable_frames = stable_frames
+        self.move_px = move_px
+        self.stable_px = stable_px
+        self.timeout = timeout
+        self.min_score = min_score
+        self.window_name = window_name
+        self.background = None
+        self.samples = []
+        self.settle_times = []
+        self.missed = []
+
+    def read(self):
+        captured = self.camera.read(timeout=self.timeout)
+        if captured is None:
+            raise RuntimeError(f"no camera frame within {self.timeout:.1f} s")
+        return captured
+
+    def written_at(self, since):
+        times = [at for pin in self.servo_pins for at, _ in pin.writes if at >= since]
+        return min(times) if times else None
+
+    def capture_background(self, frames=5):
+        # Median of a few laser-off frames, so sensor noise is not taken
+        # for the dot.
+        self.servo_channel.set_laser(0)
+        time.sleep(0.1)
+        stack = [self.read().image.copy() for _ in range(frames)]
+        self.background = np.median(stack, axis=0).astype(np.uint8)
+
+    def measure(self, angle_x, angle_y, origin=None):
+        # Returns the settled dot position, the time the aim was requested,
+        # the capture time of the first frame with the dot away from origin
+        # and the start of the still period; None on timeout. origin: where
+        # the dot settled for the previous angle. Frames are ignored until
+        # the dot has left it, so the turret still sitting at the old angle
+        # is not taken as settled.
+        aimed_at = time.time()
+        self.servo_channel.aim(angle_x, angle_y)
+        track = []
+        moved_at = None
+        while True:
+            captured = self.read()
+            now = captured.timestamp
+            if now - aimed_at > self.timeout:
+                return None
+            if now < aimed_at:
+                continue
+            dot = find_laser_dot(captured.image, self.background, self.min_score)
+            self.show(captured.image, dot)
+            if dot is None:
+                track = []
+                continue
+            x, y = dot[:2]
+            if moved_at is None:
+                if origin is not None and math.hypot(x - origin[0], y - origin[1]) < self.move_px:
+                    continue
+                moved_at = now
+            track.append((now, x, y))
+            # Drop everything before the last frame that was off by more
+            # than stable_px; what is left has been still since then.
+            while math.hypot(track[0][1] - x, track[0][2] - y) >= self.stable_px:
+                track.pop(0)
+            if len(track) >= self.stable_frames and now - track[0][0] >= self.stable_time:
+                return (x, y), aimed_at, moved_at, track[0][0]
+
+    def show(self, image, dot):
+        if not self.window_name:
+            return
+        frame = image.copy()
+        if dot is not None:
+            cv2.circle(frame, (int(dot[0]), int(dot[1])), 12, (0, 255, 0), 2)
+        cv2.putText(frame, f"{len(self.samples)} / {len(self.angles)} samples", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        cv2.imshow(self.window_name, frame)
+        if cv2.waitKey(1) == 27:
+            raise KeyboardInterrupt
+
+    def run(self):
+        self.capture_background()
+        self.servo_channel.set_laser(1)
+        try:
+            origin = None
+            for angle_x, angle_y in self.angles:
+                result = self.measure(angle_x, angle_y, origin)
+                if result is None:
+                    self.missed.append((angle_x, angle_y))
+                    continue
+                position, aimed_at, _, settled_at = result
+                origin = position
+                self.samples.append({"screen_pos": [round(position[0], 2), round(position[1], 2)],
+                                     "servo_x": angle_x, "servo_y": angle_y})
+                written_at = self.written_at(aimed_at)
+                if written_at is not None:
+                    self.settle_times.append(settled_at - written_at)
+        finally:
+            self.servo_channel.set_laser(0)
+        # An affine fit needs three points; fewer means the dot was not seen.
+        if len(self.samples) < 3:
+            raise ValueError(f"laser dot found at {len(self.samples)} of {len(self.angles)} angles; "
+                             f"check the laser and the camera exposure")
+        frame_h, frame_w = self.background.shape[:2]
+        servo_map = ServoMap.fit(self.samples, frame_w, frame_h)
+        calibration_data = {
+            "points": self.samples,
+            "frame_width": frame_w,
+            "frame_height": frame_h,
+            "model": servo_map.to_dict(),
+        }
+        if self.settle_times:
+            # From the servo pin write to the turret standing still, so it
+            # excludes the command latency auto-aim adds on top. The slowest
+            # settle that is not an outlier.
+            calibration_data["settle_time"] = float(np.percentile(self.settle_times, 90))
+        return calibration_data
+
+    def report(self, calibration_data):
+        servo_map = ServoMap.from_dict(calibration_data["model"])
+        report = (f"{len(self.samples)} samples, {len(self.missed)} angles without a visible dot\n"
+                  f"{servo_map.report(self.samples).splitlines()[0]}")
+        if not self.settle_times:
+            return report + "\nsettle time: no servo writes were timed"
+        settle = np.array(self.settle_times) * 1000
+        return (f"{report}\nsettle time: median {np.median(settle):.0f} ms, p90 {np.percentile(settle, 90):.0f} ms, "
+                f"max {settle.max():.0f} ms")
+
+
+class SimulatedTurret:
+    # A camera and board for trying auto-calibration without hardware. The
+    # servo pins move towards the commanded angle with a first-order lag of
+    # settle_tau seconds, and frames at fps show a red laser dot where a
+    # known, slightly nonlinear mapping puts it. Each frame shows the turret
+    # as it was camera_delay seconds before the frame is handed out.
+    def __init__(self, background, settle_tau=0.03, fps=90, camera_delay=0.0, write_latency=0.0, seed=0):
+        self.board = MockBoard(write_latency=write_latency)
+        self.camera_delay = camera_delay
+        self.period = 1.0 / fps
+        self.next_frame = 0.0
+        self.source = SyntheticSource(background, noise=4, seed=seed)
+        self.frame_h, self.frame_w = background.shape[:2]
+        self.settle_tau = settle_tau
+        # Per axis: angle at the last command, commanded angle, command time.
+        self.axes = {"d:9:s": [90.0, 90.0, 0.0], "d:10:s": [70.0, 70.0, 0.0]}
+        self.seen = {spec: 0 for spec in self.axes}
+        # MockPin write times are monotonic; frames use the wall clock.
+        self.clock_offset = time.time() - time.monotonic()
+        ys, xs = np.mgrid[-8:9, -8:9]
+        self.dot = np.exp(-(xs ** 2 + ys ** 2) / 8.0)[..., None] * (60, 90, 255)
+
+    def get_pin(self, spec):
+        return self.board.get_pin(spec)
+
+    def exit(self):
+        pass
+
+    def angle(self, spec, now):
+        axis = self.axes[spec]
+        writes = self.board.get_pin(spec).writes
+        while self.seen[spec] < len(writes) and writes[self.seen[spec]][0] + self.clock_offset <= now:
+            at, value = writes[self.seen[spec]]
+            at += self.clock_offset
+            axis[0] = self._lagged(axis, at)
+            axis[1], axis[2] = float(value), at
+            self.seen[spec] += 1
+        return self._lagged(axis, now)
+
+    def laser(self, now):
+        value = 0
+        for at, written in self.board.get_pin("d:3:o").writes:
+            if at + self.clock_offset > now:
+                break
+            value = written
+        return value
+
+    def _lagged(self, axis, now):
+        start, target, at = axis
+        return target + (start - target) * math.exp(-max(now - at, 0.0) / self.settle_tau)
+
+    def true_position(self, angle_x, angle_y):
+        u = (ANGLE_RANGE_X[1] - angle_x) / (ANGLE_RANGE_X[1] - ANGLE_RANGE_X[0])
+        v = (angle_y - ANGLE_RANGE_Y[0]) / (ANGLE_RANGE_Y[1] - ANGLE_RANGE_Y[0])
+        x = self.frame_w * (0.08 + 0.84 * u + 0.03 * math.sin(math.pi * v))
+        y = self.frame_h * (0.1 + 0.8 * v + 0.04 * (u - 0.5) ** 2)
+        return x, y
+
+    def read(self, timeout=None):
+        delay = self.next_frame - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.time()
+        self.next_frame = max(self.next_frame + self.period, now)
+        image = self.source.read().image.copy()
+        seen_at = now - self.camera_delay
+        x, y = self.true_position(self.angle("d:9:s", seen_at), self.angle("d:10:s", seen_at))
+        if self.laser(seen_at):
+            cx, cy = int(round(x)), int(round(y))
+            if 8 <= cx < self.frame_w - 8 and 8 <= cy < self.frame_h - 8:
+                patch = image[cy - 8:cy + 9, cx - 8:cx + 9]
+                np.copyto(patch, np.clip(patch + self.dot, 0, 255).astype(np.uint8))
+        return CapturedFrame(image, 0, now, 0)
+
+    def release(self):
+        pass
+
+
+def run_auto_calibration(camera, board, config, window_name=None):
+    servo_pins = (TimedPin(board.get_pin('d:9:s')), TimedPin(board.get_pin('d:10:s')))
+    servo_channel = ServoChannel(*servo_pins, board.get_pin('d:3:o'), rate_hz=config["servo_rate_hz"]).start()
+    calibrator = AutoCalibrator(camera, servo_channel, grid=config["auto_calibration_grid"], window_name=window_name,
+                                servo_pins=servo_pins)
+    try:
+        calibration_data = calibrator.run()
+    finally:
+        servo_channel.stop()
+    return calibrator, calibration_data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate the turret by finding the laser dot in camera frames.")
+    parser.add_argument("--simulate", action="store_true", help="use a simulated turret and camera")
+    parser.add_argument("--grid", type=int, nargs=2, metavar=("COLS", "ROWS"))
+    parser.add_argument("--background", default="images/background2.jpg", help="scene for the simulated camera")
+    parser.add_argument("--show", action="store_true")
+    parser.add_argument("--output", default="calibration_data.json")
+    args = parser.parse_args(argv)
+
+    from calibration import save_calibration
+    from config import load_config
+    config = load_config()
+    if args.grid:
+        config["auto_calibration_grid"] = args.grid
+    window_name = "Auto calibration" if args.show else None
+    start = time.perf_counter()
+    if args.simulate:
+        background = cv2.resize(cv2.imread(args.background), (1280, 720))
+        turret = SimulatedTurret(background)
+        calibrator, calibration_data = run_auto_calibration(turret, turret, config, window_name)
+        servo_map = ServoMap.from_dict(calibration_data["model"])
+        grid_x, grid_y = np.meshgrid(np.linspace(60, 100, 9), np.linspace(55, 77, 9))
+        truth = np.array([turret.true_position(ax, ay) for ax, ay in zip(grid_x.ravel(), grid_y.ravel())])
+        error = np.hypot(*(servo_map.predict(truth[:, 0], truth[:, 1]) - np.column_stack([grid_x.ravel(),
+                                                                                             grid_y.ravel()])).T)
+        print(f"simulated turret: error against the true mapping rms {np.sqrt(np.mean(error ** 2)):.2f} deg, "
+              f"max {error.max():.2f} deg; true settle tau {turret.settle_tau * 1000:.0f} ms")
+    else:
+        from resources import Resources
+        resources = Resources(config)
+        try:
+            calibrator, calibration_data = run_auto_calibration(resources.camera(), resources.board(), config,
+                                                                window_name)
+        finally:
+            resources.close()
+        save_calibration(calibration_data, args.output)
+    print(calibrator.report(calibration_data))
+    print(f"calibrated in {time.perf_counter() - start:.1f} s")
+    if window_name:
+        cv2.destroyWindow(window_name)
+
+
+if __name__ == "__main__":
+    main()
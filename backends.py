@@ -0,0 +1,217 @@
+import argparse
+import glob
+import hashlib
+import os
+import shutil
+import time
+
+import cv2
+import numpy as np
+
+from config import load_config
+from detector import NO_BOXES, NO_SCORES, yolo_detect
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+
+def inference_shape(size):
+    # 640 -> (640, 640); [384, 640] -> (384, 640). Exported models have a
+    # fixed input, so both sides must be multiples of the YOLO stride.
+    h, w = (size, size) if isinstance(size, int) else size
+    if h % 32 or w % 32:
+        raise ValueError(f"inference size {h}x{w} is not a multiple of 32")
+    return int(h), int(w)
+
+
+def model_hash(path, chunk=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def cache_path(model_path, backend, size, int8=False, cache_dir="model_cache"):
+    h, w = inference_shape(size)
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    name = f"{stem}-{model_hash(model_path)}-{backend}-{h}x{w}{'-int8' if int8 else ''}"
+    return os.path.join(cache_dir, name + (".onnx" if backend == "onnx" else ""))
+
+
+def export_model(model_path, backend, size, int8=False, cache_dir="model_cache", data=None):
+    # Exports once and reuses the artifact on later starts. A changed .pt file
+    # changes the hash, so stale exports are never picked up.
+    path = cache_path(model_path, backend, size, int8, cache_dir)
+    if os.path.exists(path):
+        return path
+    from ultralytics import YOLO
+    os.makedirs(cache_dir, exist_ok=True)
+    options = dict(imgsz=list(inference_shape(size)), dynamic=False)
+    if backend == "onnx":
+        exported = YOLO(model_path).export(format="onnx", simplify=True, **options)
+        if int8:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(exported, path + ".tmp", weight_type=QuantType.QUInt8)
+            os.remove(exported)
+            exported = path + ".tmp"
+    elif backend == "openvino":
+        if int8 and data:
+            options["data"] = data
+        exported = YOLO(model_path).export(format="openvino", int8=int8, **options)
+    else:
+        raise ValueError(f"unknown export backend {backend!r}")
+    shutil.move(exported, path)
+    return path
+
+
+def letterbox(frame, shape, out):
+    # Resizes frame into out (shape h x w, grey padding) keeping the aspect
+    # ratio, the same way ultralytics does, and returns the mapping back.
+    h, w = frame.shape[:2]
+    scale = min(shape[0] / h, shape[1] / w)
+    new_h, new_w = round(h * scale), round(w * scale)
+    top, left = (shape[0] - new_h) // 2, (shape[1] - new_w) // 2
+    out[:] = 114
+    out[top:top + new_h, left:left + new_w] = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    return scale, left, top
+
+
+def decode(output, scale, left, top, frame_shape, conf=0.25, iou=0.7):
+    # YOLOv8 head output is (1, 4 + classes, anchors) with centre-size boxes
+    # in input pixels. NMS is class-agnostic; the drone model has one class.
+    pred = output[0]
+    scores = pred[4:].max(axis=0)
+    keep = scores > conf
+    if not keep.any():
+        return NO_BOXES, NO_SCORES
+    cx, cy, w, h = pred[:4, keep]
+    scores = scores[keep]
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    boxes -= (left, top, left, top)
+    boxes /= scale
+    boxes[:, 0::2] = boxes[:, 0::2].clip(0, frame_shape[1])
+    boxes[:, 1::2] = boxes[:, 1::2].clip(0, frame_shape[0])
+    rects = np.column_stack([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]])
+    indices = np.asarray(cv2.dnn.NMSBoxes(rects.tolist(), scores.tolist(), conf, iou), dtype=int).reshape(-1)
+    return boxes[indices].astype(np.float32), scores[indices].astype(np.float32)
+
+
+class TorchDetector:
+    # The ultralytics model as the game has always run it, at a configurable
+    # inference size. ultralytics maps the boxes back to frame pixels.
+    def __init__(self, model, size=640, conf=0.25, iou=0.7):
+        self.model = model
+        self.shape = inference_shape(size)
+        self.conf = conf
+        self.iou = iou
+
+    def __call__(self, frame):
+        return yolo_detect(self.model, frame, imgsz=self.shape, conf=self.conf, iou=self.iou)
+
+    def detect_crops(self, frame, corners, size):
+        # One batched call for all crops; boxes are in crop pixels.
+        crops = [frame[y:y + size, x:x + size] for x, y in corners]
+        results = self.model(crops, imgsz=self.shape, conf=self.conf, iou=self.iou, verbose=False)
+        return [(r.boxes.xyxy.cpu().numpy(), r.boxes.conf.cpu().numpy()) for r in results]
+
+
+class ExportedDetector:
+    # Runs an exported model on the CPU with ONNX Runtime or OpenVINO. Only
+    # numpy and OpenCV are used around the runtime, so neither torch nor
+    # ultralytics has to be installed once the export is cached.
+    def __init__(self, path, backend, size=640, conf=0.25, iou=0.7, threads=0):
+        self.backend = backend
+        self.shape = inference_shape(size)
+        self.conf = conf
+        self.iou = iou
+        self.input = np.zeros(self.shape + (3,), dtype=np.uint8)
+        if backend == "onnx":
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            if threads:
+                options.intra_op_num_threads = threads
+            session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+            name = session.get_inputs()[0].name
+            self.infer = lambda blob: session.run(None, {name: blob})[0]
+        elif backend == "openvino":
+            import openvino as ov
+            core = ov.Core()
+            if threads:
+                core.set_property("CPU", {"INFERENCE_NUM_THREADS": threads})
+            compiled = core.compile_model(glob.glob(os.path.join(path, "*.xml"))[0], "CPU")
+            output = compiled.output(0)
+            self.infer = lambda blob: compiled([blob])[output]
+        else:
+            raise ValueError(f"unknown export backend {backend!r}")
+
+    def __call__(self, frame):
+        scale, left, top = letterbox(frame, self.shape, self.input)
+        blob = cv2.dnn.blobFromImage(self.input, 1 / 255.0, swapRB=True)
+        return decode(self.infer(blob), scale, left, top, frame.shape, self.conf, self.iou)
+
+    def detect_crops(self, frame, corners, size):
+        # Exports have a fixed batch of one, so crops run one after another
+        # through a model exported at the crop size.
+        return [self(frame[y:y + size, x:x + size]) for x, y in corners]
+
+
+def match_iou(boxes, reference):
+    # Mean IoU of each reference box with its best match in boxes.
+    if not len(reference):
+        return 1.0 if not len(boxes) else 0.0
+    if not len(boxes):
+        return 0.0
+    lt = np.maximum(reference[:, None, :2], boxes[None, :, :2])
+    rb = np.minimum(reference[:, None, 2:], boxes[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area = lambda b: np.prod(b[:, 2:] - b[:, :2], axis=1)
+    union = area(reference)[:, None] + area(boxes)[None, :] - inter
+    return float((inter / np.maximum(union, 1e-9)).max(axis=1).mean())
+
+
+def benchmark(argv=None):
+    parser = argparse.ArgumentParser(description="Compare detector backends against the plain model(frame) call.")
+    parser.add_argument("--model", default=load_config()["model_path"])
+    parser.add_argument("--source", default="images", help="image directory or glob to run on")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "openvino"], choices=BACKENDS)
+    parser.add_argument("--size", type=int, nargs="+", default=[640], help="inference size: N or H W")
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--cache-dir", default="model_cache")
+    args = parser.parse_args(argv)
+    size = args.size[0] if len(args.size) == 1 else args.size
+
+    from capture import list_images
+    frames = [cv2.resize(cv2.imread(path), (1280, 720)) for path in list_images(args.source)]
+    if not frames:
+        raise SystemExit(f"no images found in {args.source}")
+
+    from ultralytics import YOLO
+    model = YOLO(args.model)
+    detectors = [("model(frame)", lambda frame: yolo_detect(model, frame))]
+    for backend in args.backends:
+        if backend == "torch":
+            detectors.append((f"torch {size}", TorchDetector(model, size)))
+            continue
+        start = time.perf_counter()
+        path = export_model(args.model, backend, size, args.int8, args.cache_dir)
+        detector = ExportedDetector(path, backend, size)
+        print(f"{backend}: ready in {time.perf_counter() - start:.1f} s ({path})")
+        detectors.append((f"{backend} {size}{' int8' if args.int8 else ''}", detector))
+
+    reference = [detectors[0][1](frame) for frame in frames]
+    print(f"{'detector':<24}{'mean ms':>10}{'p95 ms':>10}{'box IoU':>10}")
+    for name, detect in detectors:
+        detect(frames[0])
+        times = []
+        for i in range(args.runs):
+            start = time.perf_counter()
+            detect(frames[i % len(frames)])
+            times.append(time.perf_counter() - start)
+        agreement = np.mean([match_iou(detect(frame)[0], ref[0]) for frame, ref in zip(frames, reference)])
+        times = np.array(times) * 1000
+        print(f"{name:<24}{times.mean():>10.2f}{np.percentile(times, 95):>10.2f}{agreement:>10.3f}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,115 @@
+import argparse
+import platform
+import time
+
+import cv2
+import numpy as np
+
+from capture import FrameGrabber, SyntheticSource
+from compositing import load_sprite
+from config import load_config
+from detector import RoiDetector, SyncDetector
+from display import NullDisplay, NullSound
+from engine import STAGES, GameEngine, load_calibration
+from profiler import StageTimer
+from servo import MockBoard
+
+
+def ground_truth_boxes(drone_movement):
+    # Stub detector output: the simulator's own drone boxes.
+    if drone_movement.no_drone_period:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros((0,), dtype=np.float32)
+    x, y = drone_movement.x, drone_movement.y
+    boxes = np.column_stack([x, y, x + drone_movement.drone_w, y + drone_movement.drone_h]).astype(np.float32)
+    return boxes, np.full(len(boxes), 0.9, dtype=np.float32)
+
+
+class StubCropDetector:
+    # Crop counterpart of the stub detector: costs detect_ms scaled by the
+    # cropped area and returns the simulator boxes, clipped to each crop,
+    # that are at least half visible in it.
+    def __init__(self, args, engine_ref):
+        self.args = args
+        self.engine_ref = engine_ref
+
+    def detect_crops(self, frame, corners, size):
+        if self.args.detect_ms:
+            time.sleep(self.args.detect_ms / 1000 * len(corners) * size * size / (frame.shape[0] * frame.shape[1]))
+        boxes, scores = ground_truth_boxes(self.engine_ref[0].drone_movement)
+        results = []
+        for x, y in corners:
+            crop = boxes - np.array([x, y, x, y], dtype=np.float32)
+            clipped = crop.clip(0, size)
+            visible = np.prod(clipped[:, 2:] - clipped[:, :2], axis=1) / np.prod(crop[:, 2:] - crop[:, :2], axis=1)
+            results.append((clipped[visible >= 0.5], scores[visible >= 0.5]))
+        return results
+
+
+def build_engine(args, config, timer):
+    drone_rgb, drone_alpha = load_sprite("images/drone.png", scale=0.4)
+    background = cv2.resize(cv2.imread(args.background), (1280, 720))
+    if args.source:
+        frame_source = FrameGrabber(args.source, 1280, 720, fps=0, loop=True).start()
+    else:
+        frame_source = SyntheticSource(background, seed=args.seed)
+
+    engine_ref = [None]
+
+    def stub_detect(frame):
+        if args.detect_ms:
+            time.sleep(args.detect_ms / 1000)
+        return ground_truth_boxes(engine_ref[0].drone_movement)
+
+    detect = stub_detect
+    if config["roi_detection"]:
+        detect = RoiDetector(stub_detect, StubCropDetector(args, engine_ref), config["roi_size"],
+                             config["roi_full_every"], config["roi_min_score"])
+    detector = SyncDetector(detect, every_n_frames=config["detect_every_n_frames"])
+    engine = engine_ref[0] = GameEngine(config, args.difficulty, args.drones, load_calibration(), drone_rgb, drone_alpha,
+                        background, frame_source, detector, MockBoard(), NullDisplay(), NullSound(), timer=timer)
+    engine.drone_movement.no_drone_period = False
+    engine.auto_aim = args.auto_aim
+    return engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the game loop headless and report per-stage frame timings.")
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--source", help="video file or image directory/glob; synthetic frames if omitted")
+    parser.add_argument("--background", default="images/background2.jpg")
+    parser.add_argument("--drones", type=int, default=3)
+    parser.add_argument("--difficulty", type=int, default=3)
+    parser.add_argument("--detect-ms", type=float, default=0.0, help="simulated inference time of the stub detector")
+    parser.add_argument("--detect-every", type=int, default=1)
+    parser.add_argument("--auto-aim", action="store_true")
+    parser.add_argument("--roi", action="store_true", help="detect on crops around tracked drones")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timing-log", help="also write per-frame timings here (.csv or binary)")
+    args = parser.parse_args(argv)
+
+    config = load_config()
+    config.update(board_port="mock", seed=args.seed, detect_every_n_frames=args.detect_every,
+                  roi_detection=args.roi)
+
+    timer = StageTimer(STAGES)
+    engine = build_engine(args, config, timer)
+    engine.run(max_frames=args.warmup)
+    timer = engine.timer = StageTimer(STAGES, log_path=args.timing_log)
+    start = time.perf_counter()
+    frames = engine.run(max_frames=args.frames)
+    elapsed = time.perf_counter() - start
+    engine.close()
+    engine.frame_source.release()
+
+    print(f"python {platform.python_version()}, numpy {np.__version__}, opencv {cv2.__version__}, {platform.machine()}")
+    print(f"{frames} frames, {args.drones} drones, difficulty {args.difficulty}, seed {args.seed}, "
+          f"source {args.source or 'synthetic'}, stub detect {args.detect_ms} ms every {args.detect_every}")
+    print(timer.report())
+    print(f"{frames / elapsed:.1f} frames/s")
+    if args.roi:
+        print(engine.detector.detect_fn.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,14 @@
 import cv2
 import numpy as np
-from pyfirmata import Arduino, util
 import json
 import time
-import subprocess
-
-
-board = Arduino('COM12')
-servo_x = board.get_pin('d:9:s')
-servo_y = board.get_pin('d:10:s')
-laser_pin = board.get_pin('d:3:o')
-
-
-servo_x.write(90)
-servo_y.write(70)
-laser_pin.write(0)
+from config import load_config
+from resources import Resources
+from servo import ServoChannel
+from servo_map import ServoMap
 
 # Global 
+servo_channel = None
 crosshair_x = 640
 crosshair_y = 360
 calibration_points = []
@@ -32,6 +24,13 @@ points_to_calibrate = [
     {"pos": (1180, 620), "name": "Bottom Right"}
 ]
 
+def grid_points(cols, rows, margin=100):
+    # A cols x rows grid of targets, for fitting more than the five-point model.
+    xs = np.linspace(margin, frame_w - margin, cols).round().astype(int)
+    ys = np.linspace(margin, frame_h - margin, rows).round().astype(int)
+    return [{"pos": (int(x), int(y)), "name": f"R{r + 1}C{c + 1}"}
+            for r, y in enumerate(ys) for c, x in enumerate(xs)]
+
 def map_angle(value, left_min, left_max, right_min, right_max):
     value = max(left_min, min(value, left_max))
     left_span = left_max - left_min
@@ -39,7 +38,20 @@ def map_angle(value, left_min, left_max, right_min, right_max):
     value_scaled = float(value - left_min) / float(left_span)
     return round(max(52, min(110, right_min + (value_scaled * right_span))))
 
+# Measured by other tools (auto-calibration, latency_probe.py --apply);
+# kept when a calibration that does not measure them is saved.
+MEASURED_KEYS = ("settle_time",)
+
 def save_calibration(calibration_data, filename='calibration_data.json'):
+    calibration_data = dict(calibration_data)
+    try:
+        with open(filename) as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+    for key in MEASURED_KEYS:
+        if key in previous and key not in calibration_data:
+            calibration_data[key] = previous[key]
     with open(filename, 'w') as f:
         json.dump(calibration_data, f)
 
@@ -49,9 +61,8 @@ def mouse_callback(event, x, y, flags, param):
     if event == cv2.EVENT_MOUSEMOVE:
         crosshair_x = x
         crosshair_y = y
-        
-    servo_x.write(map_angle(crosshair_x, 0, frame_w, 110, 52))
-    servo_y.write(map_angle(crosshair_y, 0, frame_h, 52, 80))
+        servo_channel.aim(map_angle(crosshair_x, 0, frame_w, 110, 52),
+                          map_angle(crosshair_y, 0, frame_h, 52, 80))
     
     if event == cv2.EVENT_LBUTTONDOWN:
         current_angles = {
@@ -67,26 +78,67 @@ def draw_crosshair(frame, x, y, size=20, color=(0, 0, 255)):
     cv2.line(frame, (x, y - size), (x, y + size), color, 2)
     cv2.circle(frame, (x, y), 2, color, -1)
 
-def main():
-    global current_point, frame_w, frame_h
-    
-    camera = cv2.VideoCapture(0)
-    camera.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-    
-    if not camera.isOpened():
+def auto_calibrate(resources, camera):
+    # Imported here: auto_calibration uses save_calibration from this module.
+    from auto_calibration import run_auto_calibration
+    # Created up front so it can be destroyed however the run ends.
+    cv2.namedWindow("Calibration")
+    try:
+        calibrator, calibration_data = run_auto_calibration(camera, resources.board(), resources.config,
+                                                            window_name="Calibration")
+    except KeyboardInterrupt:
+        print("Calibration was cancelled")
+        cv2.destroyWindow("Calibration")
+        return False
+    except (ValueError, RuntimeError) as e:
+        print(f"Auto-calibration failed: {e}")
+        cv2.destroyWindow("Calibration")
+        return False
+    cv2.destroyWindow("Calibration")
+    print(calibrator.report(calibration_data))
+    save_calibration(calibration_data)
+    print("Calibration completed successfully!")
+    return True
+
+def main(resources=None):
+    global current_point, calibration_points, frame_w, frame_h, servo_channel, points_to_calibrate
+
+    own_resources = resources is None
+    if own_resources:
+        resources = Resources(load_config())
+
+    try:
+        camera = resources.camera()
+    except RuntimeError:
         print("Failed to open camera")
         return False
+
+    if resources.config["auto_calibration"]:
+        success = auto_calibrate(resources, camera)
+        if own_resources:
+            resources.close()
+        return success
+
+    if resources.config["calibration_grid"]:
+        points_to_calibrate = grid_points(*resources.config["calibration_grid"])
+
+    board = resources.board()
+    servo_channel = ServoChannel(board.get_pin('d:9:s'), board.get_pin('d:10:s'), board.get_pin('d:3:o'),
+                                 rate_hz=resources.config["servo_rate_hz"]).start()
+    servo_channel.aim(90, 70)
+    calibration_points = []
+    current_point = 0
     
-    laser_pin.write(1)
+    servo_channel.set_laser(1)
     
     cv2.namedWindow("Calibration")
     cv2.setMouseCallback("Calibration", mouse_callback)
     
     while current_point < len(points_to_calibrate):
-        ret, frame = camera.read()
-        if not ret:
+        captured = camera.read()
+        if captured is None:
             break
+        frame = captured.image
             
         frame_h, frame_w = frame.shape[:2]
         
@@ -104,7 +156,7 @@ def main():
         if key == 27:
             break
             
-    laser_pin.write(0)
+    servo_channel.set_laser(0)
     
     if current_point >= len(points_to_calibrate):
         calibration_data = {
@@ -112,6 +164,9 @@ def main():
             "frame_width": frame_w,
             "frame_height": frame_h
         }
+        servo_map = ServoMap.fit(calibration_points, frame_w, frame_h)
+        print(servo_map.report(calibration_points))
+        calibration_data["model"] = servo_map.to_dict()
         save_calibration(calibration_data)
         print("Calibration completed successfully!")
         success = True
@@ -119,13 +174,14 @@ def main():
         print("Calibration was cancelled")
         success = False
     
-    camera.release()
-    cv2.destroyAllWindows()
-    
-    if success:
-        subprocess.run(["python", "menu.py"])  
+    servo_channel.stop()
+    cv2.destroyWindow("Calibration")
+    if own_resources:
+        resources.close()
     
     return success
 
 if __name__ == "__main__":
-    main()
+    if main():
+        import app
+        app.main()
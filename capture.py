@@ -0,0 +1,204 @@
+import glob
+import os
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+CapturedFrame = namedtuple("CapturedFrame", ["image", "frame_id", "timestamp", "dropped"])
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def list_images(source):
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source)
+    return sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS))
+
+
+class SyntheticSource:
+    # Frame source for headless runs: hands out the same background image with
+    # a little deterministic noise, as fast as it is asked for.
+    def __init__(self, background, noise=8, seed=0, variants=8):
+        rng = np.random.default_rng(seed)
+        self.frames = []
+        for _ in range(variants):
+            frame = background.astype(np.int16) + rng.integers(-noise, noise + 1, background.shape, dtype=np.int16)
+            self.frames.append(np.clip(frame, 0, 255).astype(np.uint8))
+        self.frame_id = 0
+        self.dropped = 0
+
+    def is_opened(self):
+        return True
+
+    def start(self):
+        return self
+
+    def read(self, timeout=None):
+        image = self.frames[self.frame_id % len(self.frames)]
+        captured = CapturedFrame(image, self.frame_id, time.time(), 0)
+        self.frame_id += 1
+        return captured
+
+    def release(self):
+        pass
+
+
+class FrameGrabber:
+    # Reads frames on a background thread into a preallocated ring of buffers.
+    # read() hands out the newest frame as a view into the ring; the writer
+    # never touches the slot a consumer currently holds or the newest slot.
+    def __init__(self, source=0, width=1280, height=720, ring_size=4, fps=None, loop=False):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.ring_size = max(3, ring_size)
+        self.fps = fps
+        self.loop = loop
+        self.dropped = 0
+        self.finished = False
+        self.ring = None
+        self._cap = None
+        self._images = None
+        self._image_index = 0
+        self._stamps = np.zeros(self.ring_size)
+        self._ids = np.zeros(self.ring_size, dtype=np.int64)
+        self._cond = threading.Condition()
+        self._newest = -1
+        self._leased = -1
+        self._last_read_id = -1
+        self._next_id = 0
+        self._running = False
+        self._thread = None
+
+    def is_opened(self):
+        return self.ring is not None
+
+    def start(self):
+        if isinstance(self.source, int):
+            self._cap = cv2.VideoCapture(self.source)
+            self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        elif os.path.isdir(self.source) or self.source.lower().endswith(IMAGE_EXTENSIONS) or "*" in self.source:
+            self._images = list_images(self.source)
+            if self.fps is None:
+                self.fps = 30
+        else:
+            self._cap = cv2.VideoCapture(self.source)
+            if self.fps is None:
+                self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 30
+
+        first = self._read_next(None)
+        if first is None:
+            self.release()
+            return self
+        self.ring = np.empty((self.ring_size,) + first.shape, dtype=np.uint8)
+        self._publish(0, first)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def read(self, timeout=0.0):
+        # Hands out the newest frame. With no timeout (the game loop) it never
+        # blocks: while a live camera stalls the previous frame comes back
+        # again, and None only means a file source has run out. With a
+        # timeout it waits that long for a frame newer than the previous read
+        # and returns None if none arrives.
+        with self._cond:
+            if timeout and not self._cond.wait_for(self._has_new_frame, timeout):
+                return None
+            if self._newest < 0:
+                return None
+            if self.finished and self._ids[self._newest] == self._last_read_id:
+                return None
+            slot = self._leased = self._newest
+            self._last_read_id = self._ids[slot]
+            return CapturedFrame(self.ring[slot], int(self._ids[slot]), float(self._stamps[slot]), self.dropped)
+
+    def release(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def _has_new_frame(self):
+        return self.finished or (self._newest >= 0 and self._ids[self._newest] != self._last_read_id)
+
+    def _read_next(self, buffer):
+        if self._images is not None:
+            if self._image_index >= len(self._images):
+                if not self.loop or not self._images:
+                    return None
+                self._image_index = 0
+            image = cv2.imread(self._images[self._image_index])
+            self._image_index += 1
+            if image is None:
+                return None
+            if image.shape[1] != self.width or image.shape[0] != self.height:
+                return cv2.resize(image, (self.width, self.height), dst=buffer)
+            if buffer is None:
+                return image
+            np.copyto(buffer, image)
+            return buffer
+
+        ret, image = self._cap.read(buffer)
+        if not ret and self.loop and not isinstance(self.source, int):
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, image = self._cap.read(buffer)
+        if not ret:
+            return None
+        if buffer is not None and image is not buffer:
+            if image.shape != buffer.shape:
+                image = cv2.resize(image, (buffer.shape[1], buffer.shape[0]))
+            np.copyto(buffer, image)
+            return buffer
+        return image
+
+    def _publish(self, slot, image):
+        if image is not self.ring[slot]:
+            np.copyto(self.ring[slot], image)
+        with self._cond:
+            if self._newest >= 0 and self._ids[self._newest] != self._last_read_id:
+                self.dropped += 1
+            self._ids[slot] = self._next_id
+            self._stamps[slot] = time.time()
+            self._next_id += 1
+            self._newest = slot
+            self._cond.notify_all()
+
+    def _free_slot(self):
+        with self._cond:
+            slot = (self._newest + 1) % self.ring_size
+            while slot == self._newest or slot == self._leased:
+                slot = (slot + 1) % self.ring_size
+            return slot
+
+    def _run(self):
+        period = 1.0 / self.fps if self.fps else 0.0
+        next_time = time.time() + period
+        while self._running:
+            slot = self._free_slot()
+            image = self._read_next(self.ring[slot])
+            if image is None:
+                # A live camera that fails a read is retried; files end.
+                if isinstance(self.source, int) and self._running:
+                    time.sleep(0.01)
+                    continue
+                break
+            if period:
+                delay = next_time - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                next_time = max(next_time + period, time.time())
+            self._publish(slot, image)
+        with self._cond:
+            self.finished = True
+            self._cond.notify_all()
@@ -0,0 +1,98 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class SpriteCompositor:
+    # Alpha-blends one sprite at many positions using 8.8 fixed point:
+    # out = (dst * (256 - a) + rgb * a) / 256, with rgb * a premultiplied once.
+    # All per-frame work happens in preallocated buffers.
+    def __init__(self, sprite_rgb, sprite_alpha):
+        self.h, self.w = sprite_rgb.shape[:2]
+        weight = np.rint(np.clip(sprite_alpha, 0, 1) * 256).astype(np.uint16)
+        weight = np.repeat(weight.reshape(self.h, self.w, 1), 3, axis=2)
+        self.premultiplied = sprite_rgb.astype(np.uint16) * weight
+        self.inverse = 256 - weight
+        self.scratch = np.empty((self.h, self.w, 3), dtype=np.uint16)
+        self.outputs = [None, None]
+        self.current = 0
+
+    def compose(self, background, positions):
+        # Alternates between two output frames, so the frame returned last
+        # time stays intact while this one is drawn.
+        self.current ^= 1
+        output = self.outputs[self.current]
+        if output is None or output.shape != background.shape:
+            output = self.outputs[self.current] = np.empty_like(background)
+        np.copyto(output, background)
+        for x, y in positions:
+            self.blend(output, x, y)
+        return output
+
+    def blend(self, frame, x, y):
+        frame_h, frame_w = frame.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + self.w, frame_w), min(y + self.h, frame_h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        sx, sy = x0 - x, y0 - y
+        sw, sh = x1 - x0, y1 - y0
+        roi = frame[y0:y1, x0:x1]
+        scratch = self.scratch[:sh, :sw]
+        np.copyto(scratch, roi)
+        cv2.multiply(scratch, self.inverse[sy:sy + sh, sx:sx + sw], dst=scratch)
+        cv2.add(scratch, self.premultiplied[sy:sy + sh, sx:sx + sw], dst=scratch)
+        cv2.convertScaleAbs(scratch, dst=roi, alpha=1 / 256)
+
+
+def blend_loop(frame, positions, drone_rgb, drone_alpha):
+    # The per-channel float loop game.py used before SpriteCompositor.
+    drone_h, drone_w = drone_rgb.shape[:2]
+    for x_pos, y_pos in positions:
+        roi = frame[y_pos:y_pos + drone_h, x_pos:x_pos + drone_w]
+        for c in range(3):
+            roi[:, :, c] = roi[:, :, c] * (1 - drone_alpha) + drone_rgb[:, :, c] * drone_alpha
+        frame[y_pos:y_pos + drone_h, x_pos:x_pos + drone_w] = roi
+
+
+def load_sprite(path="images/drone.png", scale=0.4):
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return None, None
+    rgb = image[:, :, :3]
+    alpha = image[:, :, 3] if image.shape[2] == 4 else np.ones_like(image[:, :, 0])
+    alpha = cv2.normalize(alpha.astype(np.float32), None, 0, 1, cv2.NORM_MINMAX)
+    size = (int(rgb.shape[1] * scale), int(rgb.shape[0] * scale))
+    return cv2.resize(rgb, size), cv2.resize(alpha, size)
+
+
+def benchmark(num_drones=5, iterations=200):
+    drone_rgb, drone_alpha = load_sprite()
+    drone_h, drone_w = drone_rgb.shape[:2]
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (720, 1280, 3), dtype=np.uint8)
+    positions = [(int(rng.integers(0, 1280 - drone_w)), int(rng.integers(0, 720 - drone_h)))
+                 for _ in range(num_drones)]
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        frame = background.copy()
+        blend_loop(frame, positions, drone_rgb, drone_alpha)
+    loop_ms = (time.perf_counter() - start) * 1000 / iterations
+
+    compositor = SpriteCompositor(drone_rgb, drone_alpha)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        output = compositor.compose(background, positions)
+    compositor_ms = (time.perf_counter() - start) * 1000 / iterations
+
+    max_diff = int(np.abs(output.astype(np.int16) - frame.astype(np.int16)).max())
+    print(f"{num_drones} drones ({drone_w}x{drone_h}), {iterations} frames")
+    print(f"  per-channel float loop: {loop_ms:.3f} ms/frame")
+    print(f"  SpriteCompositor:       {compositor_ms:.3f} ms/frame ({loop_ms / compositor_ms:.1f}x)")
+    print(f"  max pixel difference:   {max_diff}")
+
+
+if __name__ == "__main__":
+    benchmark()
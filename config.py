@@ -0,0 +1,47 @@
+import json
+
+DEFAULT_CONFIG = {
+    "model_path": "D:/jammer/myGame/yolo8/yolov8n-drone.pt",
+    "sound_path": "D:/jammer/myGame/sound/blaster.mp3",
+    "drone_image_path": "D:/jammer/myGame/images/drone.png",
+    "device": "auto",
+    "warmup": True,
+    "backend": "torch",
+    "inference_size": 640,
+    "int8": False,
+    "model_cache_dir": "model_cache",
+    "roi_detection": False,
+    "roi_size": 288,
+    "roi_full_every": 15,
+    "roi_min_score": 0.4,
+    "calibration_grid": None,
+    "auto_calibration": False,
+    "auto_calibration_grid": [15, 9],
+    "record_dir": None,
+    "record_video": False,
+    "results_db": "results.db",
+    "operator": "",
+    "crosshair_speed": 300,
+    "physics_rate": 120,
+    "camera_source": 0,
+    "detect_every_n_frames": 1,
+    "show_stats": True,
+    "laser_pulse_width": 0.25,
+    "laser_cooldown": 0.25,
+    "laser_max_queued": 3,
+    "board_port": "COM12",
+    "servo_rate_hz": 50,
+    "servo_settle_time": 0.1,
+    "seed": None,
+    "profiler_overlay": False,
+    "timing_log": None,
+}
+
+def load_config(filename='game_config.json'):
+    config = dict(DEFAULT_CONFIG)
+    try:
+        with open(filename, 'r') as f:
+            config.update(json.load(f))
+    except FileNotFoundError:
+        pass
+    return config
@@ -0,0 +1,229 @@
+import argparse
+import json
+import math
+import os
+import time
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+from capture import list_images
+from drone_movement import DroneMovement
+
+# Per-worker state, loaded once by init_worker.
+_worker = {}
+
+
+def init_worker(sprite_path, background_paths, size):
+    # One OpenCV thread per process: the pool already uses every core.
+    cv2.setNumThreads(1)
+    sprite = cv2.imread(sprite_path, cv2.IMREAD_UNCHANGED)
+    if sprite is None:
+        raise RuntimeError(f"cannot read drone sprite {sprite_path}")
+    if sprite.shape[2] == 3:
+        sprite = np.dstack([sprite, np.full(sprite.shape[:2], 255, dtype=np.uint8)])
+    _worker["sprite"] = sprite
+    # Backgrounds are shrunk once to twice the output size, so per-image
+    # crops resize from a small image.
+    backgrounds = []
+    for path in background_paths:
+        image = cv2.imread(path)
+        scale = min(1.0, 2 * max(size[0] / image.shape[1], size[1] / image.shape[0]))
+        backgrounds.append(cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA))
+    _worker["backgrounds"] = backgrounds
+
+
+def random_background(rng, backgrounds, width, height):
+    # A random crop of a random background, at least half its size, flipped
+    # half of the time.
+    image = backgrounds[rng.integers(len(backgrounds))]
+    h, w = image.shape[:2]
+    crop_w = int(w * rng.uniform(0.5, 1.0))
+    crop_h = min(h, int(crop_w * height / width))
+    x = rng.integers(0, w - crop_w + 1)
+    y = rng.integers(0, h - crop_h + 1)
+    frame = cv2.resize(image[y:y + crop_h, x:x + crop_w], (width, height), interpolation=cv2.INTER_AREA)
+    return frame[:, ::-1].copy() if rng.random() < 0.5 else frame
+
+
+def transform_sprite(rng, sprite, size, max_rotation, max_blur):
+    # Scaled to size px wide, rotated on an expanded canvas and optionally
+    # motion blurred along a random direction. Returns BGR and alpha 0..1.
+    scale = size / sprite.shape[1]
+    image = cv2.resize(sprite, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    angle = rng.uniform(-max_rotation, max_rotation)
+    if angle:
+        h, w = image.shape[:2]
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+        new_w, new_h = int(h * sin + w * cos) + 1, int(h * cos + w * sin) + 1
+        matrix[:, 2] += (new_w - w) / 2, (new_h - h) / 2
+        image = cv2.warpAffine(image, matrix, (new_w, new_h), flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0, 0))
+    length = int(rng.integers(0, max_blur + 1)) if max_blur else 0
+    if length > 1:
+        kernel = np.zeros((length, length), dtype=np.float32)
+        kernel[length // 2, :] = 1.0 / length
+        kernel = cv2.warpAffine(kernel, cv2.getRotationMatrix2D((length / 2 - 0.5, length / 2 - 0.5),
+                                                                rng.uniform(0, 180), 1.0), (length, length))
+        kernel /= max(kernel.sum(), 1e-6)
+        image = cv2.filter2D(image, -1, kernel)
+    return image[:, :, :3], image[:, :, 3].astype(np.float32) / 255.0
+
+
+def paste(frame, rgb, alpha, x, y, min_visible):
+    # Alpha-blends the sprite with its top-left at (x, y), clipped to the
+    # frame. Returns the tight box of its visible pixels, or None when less
+    # than min_visible of the drone is inside the frame.
+    frame_h, frame_w = frame.shape[:2]
+    h, w = alpha.shape
+    x0, y0, x1, y1 = max(x, 0), max(y, 0), min(x + w, frame_w), min(y + h, frame_h)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    visible = alpha[y0 - y:y1 - y, x0 - x:x1 - x]
+    if visible.sum() < min_visible * alpha.sum():
+        return None
+    roi = frame[y0:y1, x0:x1]
+    a = visible[..., None]
+    roi[:] = (rgb[y0 - y:y1 - y, x0 - x:x1 - x] * a + roi * (1 - a)).astype(np.uint8)
+    ys, xs = np.nonzero(visible > 0.1)
+    if not len(xs):
+        return None
+    return x0 + xs.min(), y0 + ys.min(), x0 + xs.max() + 1, y0 + ys.max() + 1
+
+
+def adjust_lighting(rng, frame, noise):
+    # Exposure, contrast and colour cast as one per-channel affine transform,
+    # then sensor noise; both saturate in OpenCV without float copies.
+    gain = rng.uniform(0.6, 1.4) * rng.uniform(0.9, 1.1, 3)
+    contrast = rng.uniform(0.8, 1.2)
+    matrix = np.zeros((3, 4), dtype=np.float32)
+    matrix[:, :3] = np.diag(gain * contrast)
+    matrix[:, 3] = 128 * (1 - contrast) * gain
+    frame = cv2.transform(frame, matrix)
+    cv2.randn(noise, 0, rng.uniform(0, 6))
+    return cv2.add(frame, noise, dtype=cv2.CV_8U)
+
+
+def generate_shard(task):
+    # Writes one shard of split (train or val): images/<split>/<shard>/*.jpg
+    # and labels/<split>/<shard>/*.txt in YOLO format (class cx cy w h,
+    # normalised), plus a manifest with the seed and settings that reproduce
+    # it.
+    split, shard, seed, count, settings = task
+    rng = np.random.default_rng(seed)
+    width, height = settings["size"]
+    name = f"shard-{shard:05d}"
+    image_dir = os.path.join(settings["output"], "images", split, name)
+    label_dir = os.path.join(settings["output"], "labels", split, name)
+    os.makedirs(image_dir, exist_ok=True)
+    os.makedirs(label_dir, exist_ok=True)
+    sprite = _worker["sprite"]
+    max_drones = settings["max_drones"]
+    # Drones fly as they do in the game, so consecutive frames look like
+    # footage; the base box is the largest drone size.
+    size_min, size_max = (int(s * min(width, height)) for s in settings["drone_scale"])
+    movement = DroneMovement(speed_range=(90, 300), drone_count=max_drones, drone_size=(size_max, size_max),
+                             frame_size=(width, height), seed=int(rng.integers(2 ** 32)))
+    movement.no_drone_period = False
+    boxes_written = 0
+    noise = np.empty((height, width, 3), dtype=np.int16)
+    cv2.setRNGSeed(int(rng.integers(2 ** 31)))
+    start = time.perf_counter()
+    for i in range(count):
+        if i % settings["respawn_every"] == 0:
+            movement.respawn()
+            movement.no_drone_period = False
+        movement.advance(rng.uniform(0.05, 0.5))
+        frame = random_background(rng, _worker["backgrounds"], width, height)
+        lines = []
+        for index in rng.permutation(max_drones)[:rng.integers(settings["min_drones"], max_drones + 1)]:
+            size = int(rng.uniform(size_min, size_max))
+            rgb, alpha = transform_sprite(rng, sprite, size, settings["max_rotation"], settings["max_blur"])
+            # Centre the drone on its simulated box.
+            x = int(movement.x[index] + size_max / 2 - alpha.shape[1] / 2)
+            y = int(movement.y[index] + size_max / 2 - alpha.shape[0] / 2)
+            box = paste(frame, rgb, alpha, x, y, settings["min_visible"])
+            if box is not None:
+                x0, y0, x1, y1 = box
+                lines.append(f"0 {(x0 + x1) / 2 / width:.6f} {(y0 + y1) / 2 / height:.6f} "
+                             f"{(x1 - x0) / width:.6f} {(y1 - y0) / height:.6f}")
+        frame = adjust_lighting(rng, frame, noise)
+        stem = f"{name}-{i:05d}"
+        cv2.imwrite(os.path.join(image_dir, stem + ".jpg"), frame,
+                    [cv2.IMWRITE_JPEG_QUALITY, int(rng.integers(*settings["jpeg_quality"]))])
+        with open(os.path.join(label_dir, stem + ".txt"), "w") as f:
+            f.write("\n".join(lines) + ("\n" if lines else ""))
+        boxes_written += len(lines)
+    elapsed = time.perf_counter() - start
+    with open(os.path.join(label_dir, "manifest.json"), "w") as f:
+        json.dump({"split": split, "shard": shard, "seed": seed, "images": count, "boxes": boxes_written,
+                   "settings": settings}, f)
+    return split, shard, count, boxes_written, elapsed
+
+
+def write_dataset_yaml(output):
+    # Ultralytics finds the labels by swapping images/ for labels/ in each
+    # image path.
+    with open(os.path.join(output, "dataset.yaml"), "w") as f:
+        f.write(f"path: {os.path.abspath(output)}\ntrain: images/train\nval: images/val\nnames:\n  0: drone\n")
+
+
+def generate(output, images, shard_size=500, workers=None, seed=0, sprite="images/drone.png",
+             backgrounds="images", size=(640, 640), val_shards=1, **options):
+    settings = {"output": output, "size": list(size), "min_drones": 1, "max_drones": 4,
+                "drone_scale": (0.06, 0.3), "max_rotation": 25.0, "max_blur": 15, "min_visible": 0.4,
+                "jpeg_quality": (60, 96), "respawn_every": 20}
+    settings.update(options)
+    background_paths = [path for path in list_images(backgrounds) if os.path.basename(path) != os.path.basename(sprite)
+                        and "menu" not in os.path.basename(path)]
+    if not background_paths:
+        raise RuntimeError(f"no background images in {backgrounds}")
+    # Validation shards of shard_size images each come from their own seed
+    # stream, so they never repeat a training frame.
+    shards = math.ceil(images / shard_size)
+    seeds = np.random.SeedSequence(seed).generate_state(shards).tolist()
+    val_seeds = np.random.SeedSequence(seed, spawn_key=(1,)).generate_state(val_shards).tolist()
+    tasks = [("train", shard, seeds[shard], min(shard_size, images - shard * shard_size), settings)
+             for shard in range(shards)]
+    tasks += [("val", shard, val_seeds[shard], shard_size, settings) for shard in range(val_shards)]
+    images += val_shards * shard_size
+    os.makedirs(output, exist_ok=True)
+    write_dataset_yaml(output)
+    start = time.perf_counter()
+    written = boxes = 0
+    with Pool(workers, initializer=init_worker, initargs=(sprite, background_paths, size)) as pool:
+        for split, shard, count, shard_boxes, _ in pool.imap_unordered(generate_shard, tasks):
+            written += count
+            boxes += shard_boxes
+            print(f"{split} shard {shard:05d}: {count} images, {shard_boxes} boxes ({written}/{images})")
+    return written, boxes, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a YOLO-format drone dataset from the simulator.")
+    parser.add_argument("output")
+    parser.add_argument("--images", type=int, default=5000)
+    parser.add_argument("--shard-size", type=int, default=500)
+    parser.add_argument("--val-shards", type=int, default=1, help="validation shards of --shard-size images")
+    parser.add_argument("--workers", type=int, help="processes (default: every core)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, nargs=2, default=(640, 640), metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--backgrounds", default="images", help="directory or glob of background images")
+    parser.add_argument("--sprite", default="images/drone.png")
+    parser.add_argument("--max-drones", type=int, default=4)
+    parser.add_argument("--max-rotation", type=float, default=25.0, help="degrees")
+    parser.add_argument("--max-blur", type=int, default=15, help="longest motion blur, px")
+    args = parser.parse_args(argv)
+
+    written, boxes, elapsed = generate(args.output, args.images, args.shard_size, args.workers, args.seed,
+                                       args.sprite, args.backgrounds, tuple(args.size), args.val_shards,
+                                       max_drones=args.max_drones, max_rotation=args.max_rotation,
+                                       max_blur=args.max_blur)
+    print(f"{written} images, {boxes} boxes in {elapsed:.1f} s ({written / elapsed * 60:.0f} images per minute, "
+          f"{args.workers or os.cpu_count()} workers)")
+
+
+if __name__ == "__main__":
+    main()
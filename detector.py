@@ -0,0 +1,231 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+import cv2
+import numpy as np
+
+Detection = namedtuple("Detection", ["boxes", "scores", "frame_id", "timestamp"])
+
+NO_BOXES = np.zeros((0, 4), dtype=np.float32)
+NO_SCORES = np.zeros((0,), dtype=np.float32)
+
+
+def yolo_detect(model, frame, **options):
+    boxes = model(frame, verbose=False, **options)[0].boxes
+    return boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy()
+
+
+class RateMeter:
+    def __init__(self, window=30):
+        self.stamps = deque(maxlen=window)
+
+    def tick(self, now=None):
+        self.stamps.append(time.time() if now is None else now)
+
+    def rate(self):
+        if len(self.stamps) < 2:
+            return 0.0
+        span = self.stamps[-1] - self.stamps[0]
+        return (len(self.stamps) - 1) / span if span > 0 else 0.0
+
+
+class RoiDetector:
+    # Detects on square crops around the drones the tracker already follows
+    # instead of the whole frame. The full frame is still searched every
+    # full_every calls (to find new drones), when there are no regions, and
+    # as a fallback when a crop has no detection scoring min_score or more.
+    # crop_detect.detect_crops(frame, corners, size) returns (boxes, scores)
+    # per crop in crop pixels.
+    def __init__(self, full_detect, crop_detect, crop_size=288, full_every=15, min_score=0.4, iou=0.5):
+        self.full_detect = full_detect
+        self.crop_detect = crop_detect
+        self.crop_size = crop_size
+        self.full_every = max(1, int(full_every))
+        self.min_score = min_score
+        self.iou = iou
+        self.since_full = 0
+        self.fallbacks = 0
+        self.counts = {"full": 0, "roi": 0}
+        self.seconds = {"full": 0.0, "roi": 0.0}
+
+    def __call__(self, frame, regions=None):
+        self.since_full += 1
+        if regions and self.since_full < self.full_every:
+            start = time.perf_counter()
+            result = self._detect_regions(frame, regions)
+            self._count("roi", start)
+            if result is not None:
+                return result
+            self.fallbacks += 1
+        start = time.perf_counter()
+        result = self.full_detect(frame)
+        self._count("full", start)
+        self.since_full = 0
+        return result
+
+    def _count(self, kind, start):
+        self.counts[kind] += 1
+        self.seconds[kind] += time.perf_counter() - start
+
+    def _detect_regions(self, frame, regions):
+        h, w = frame.shape[:2]
+        size = min(self.crop_size, w, h)
+        corners = [(int(min(max(cx - size / 2, 0), w - size)), int(min(max(cy - size / 2, 0), h - size)))
+                   for cx, cy in regions]
+        all_boxes, all_scores = [], []
+        for (x, y), (boxes, scores) in zip(corners, self.crop_detect.detect_crops(frame, corners, size)):
+            if not len(scores) or scores.max() < self.min_score:
+                return None
+            all_boxes.append(boxes + np.array([x, y, x, y], dtype=boxes.dtype))
+            all_scores.append(scores)
+        boxes, scores = np.concatenate(all_boxes).astype(np.float32), np.concatenate(all_scores).astype(np.float32)
+        if len(corners) > 1:
+            # Overlapping crops see the same drone twice.
+            rects = np.column_stack([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]])
+            keep = np.asarray(cv2.dnn.NMSBoxes(rects.tolist(), scores.tolist(), 0.0, self.iou), dtype=int).reshape(-1)
+            boxes, scores = boxes[keep], scores[keep]
+        return boxes, scores
+
+    def report(self):
+        # Time saved against running the full frame on every call, using the
+        # measured mean full-frame time.
+        calls = self.counts["full"] + self.counts["roi"] - self.fallbacks
+        if not self.counts["full"] or not calls:
+            return "ROI detection: not enough calls to compare"
+        full_ms = self.seconds["full"] / self.counts["full"] * 1000
+        roi_ms = self.seconds["roi"] / max(1, self.counts["roi"]) * 1000
+        spent = (self.seconds["full"] + self.seconds["roi"]) * 1000
+        saved = calls * full_ms - spent
+        return (f"ROI detection: {self.counts['roi']} crop calls ({roi_ms:.1f} ms), "
+                f"{self.counts['full']} full-frame calls ({full_ms:.1f} ms), {self.fallbacks} fallbacks; "
+                f"saved {saved:.0f} ms ({saved / (calls * full_ms) * 100:.0f}%) against full frame every time")
+
+
+class AsyncDetector:
+    # Runs detect_fn on a worker thread. Only the newest submitted frame is
+    # kept; frames submitted while the worker is busy replace each other.
+    # detect_fn may be None until the model has loaded; frames submitted
+    # before set_detect_fn() are ignored.
+    def __init__(self, detect_fn, every_n_frames=1):
+        self.detect_fn = detect_fn
+        self.every_n_frames = max(1, int(every_n_frames))
+        self.meter = RateMeter()
+        self.dropped = 0
+        self._cond = threading.Condition()
+        self._buffers = [None, None]
+        self._pending = None
+        self._busy = None
+        self._latest = Detection(NO_BOXES, NO_SCORES, -1, 0.0)
+        self._submitted = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def set_detect_fn(self, detect_fn):
+        self.detect_fn = detect_fn
+
+    def ready(self):
+        return self.detect_fn is not None
+
+    def submit(self, frame, frame_id, regions=None, now=None):
+        # regions (e.g. predicted drone centres) are handed to the detect
+        # function together with the frame they belong to. now is the
+        # caller's time for the frame; the detection carries it so trackers
+        # stay on the caller's clock.
+        if self.detect_fn is None:
+            return False
+        self._submitted += 1
+        if (self._submitted - 1) % self.every_n_frames:
+            return False
+        with self._cond:
+            if self._pending is not None:
+                self.dropped += 1
+            slot = 1 if self._busy == 0 else 0
+            buffer = self._buffers[slot]
+            if buffer is None or buffer.shape != frame.shape:
+                buffer = self._buffers[slot] = np.empty_like(frame)
+            np.copyto(buffer, frame)
+            self._pending = (slot, frame_id, time.time() if now is None else now, regions)
+            self._cond.notify()
+        return True
+
+    def latest(self):
+        return self._latest
+
+    def fps(self):
+        return self.meter.rate()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                slot, frame_id, stamp, regions = self._pending
+                self._pending = None
+                self._busy = slot
+            try:
+                if regions is None:
+                    boxes, scores = self.detect_fn(self._buffers[slot])
+                else:
+                    boxes, scores = self.detect_fn(self._buffers[slot], regions)
+            except Exception as e:
+                print("Detection failed:", e)
+                boxes, scores = NO_BOXES, NO_SCORES
+            with self._cond:
+                self._busy = None
+                self._latest = Detection(boxes, scores, frame_id, stamp)
+            self.meter.tick()
+
+
+class SyncDetector:
+    # Same interface as AsyncDetector but runs detect_fn inline, so the
+    # detection cost shows up in the caller's timings. Used for benchmarks.
+    def __init__(self, detect_fn, every_n_frames=1):
+        self.detect_fn = detect_fn
+        self.every_n_frames = max(1, int(every_n_frames))
+        self.meter = RateMeter()
+        self._latest = Detection(NO_BOXES, NO_SCORES, -1, 0.0)
+        self._submitted = 0
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+    def ready(self):
+        return True
+
+    def submit(self, frame, frame_id, regions=None, now=None):
+        self._submitted += 1
+        if (self._submitted - 1) % self.every_n_frames:
+            return False
+        stamp = time.time() if now is None else now
+        if regions is None:
+            boxes, scores = self.detect_fn(frame)
+        else:
+            boxes, scores = self.detect_fn(frame, regions)
+        self._latest = Detection(boxes, scores, frame_id, stamp)
+        self.meter.tick()
+        return True
+
+    def latest(self):
+        return self._latest
+
+    def fps(self):
+        return self.meter.rate()
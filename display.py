@@ -0,0 +1,93 @@
+import cv2
+
+from input_events import HELD_KEYS, held_mask
+
+
+class CvDisplay:
+    # OpenCV window for the game. Mouse events, window keys and pygame events
+    # all go into the engine's InputQueue. OpenCV reports no key releases, so
+    # a WASD key read from the window counts as held for repeat_delay seconds
+    # after the first press, long enough for the OS's first auto-repeat to
+    # arrive, and once it repeats for key_hold seconds after its last repeat;
+    # pygame's pressed keys are used as well when a pygame window has focus.
+    def __init__(self, window_name="Drone Hunter", key_hold=0.15, repeat_delay=0.7):
+        import pygame
+        self.pygame = pygame
+        self.window_name = window_name
+        self.key_hold = key_hold
+        self.repeat_delay = repeat_delay
+        # name: [first press, last press]
+        self.key_times = {}
+        self.held = 0
+        self.events = None
+        cv2.namedWindow(window_name)
+        pygame.init()
+
+    def attach(self, events):
+        self.events = events
+        cv2.setMouseCallback(self.window_name, self.on_mouse)
+
+    def on_mouse(self, event, x, y, flags, param):
+        if event == cv2.EVENT_MOUSEMOVE:
+            self.events.push("move", x, y)
+        elif event == cv2.EVENT_LBUTTONDOWN:
+            self.events.push("click", x, y)
+
+    def poll(self):
+        events = self.events
+        for event in self.pygame.event.get():
+            if event.type == self.pygame.QUIT:
+                events.push("quit")
+            if event.type == self.pygame.MOUSEBUTTONDOWN and event.button == 1:
+                events.push("fire")
+        pressed = self.pygame.key.get_pressed()
+        now = events.clock()
+        held = {name for name in HELD_KEYS if pressed[getattr(self.pygame, "K_" + name)]}
+        held.update(name for name in self.key_times if self.key_held(name, now))
+        mask = held_mask(held)
+        if mask != self.held:
+            self.held = mask
+            events.push("hold", key=mask, at=now)
+
+    def key_held(self, name, now):
+        pressed_at, last_at = self.key_times[name]
+        if last_at > pressed_at:
+            return now - last_at < self.key_hold
+        return now - pressed_at < self.repeat_delay
+
+    def show(self, frame):
+        cv2.imshow(self.window_name, frame)
+        key = cv2.waitKey(1)
+        if key == -1:
+            return
+        name = chr(key & 0xFF).lower()
+        if name in HELD_KEYS:
+            now = self.events.clock()
+            if name in self.key_times and self.key_held(name, now):
+                self.key_times[name][1] = now
+            else:
+                self.key_times[name] = [now, now]
+        else:
+            self.events.push("key", key=key)
+
+    def close(self):
+        cv2.destroyWindow(self.window_name)
+
+
+class NullDisplay:
+    def attach(self, events):
+        self.events = events
+
+    def poll(self):
+        pass
+
+    def show(self, frame):
+        pass
+
+    def close(self):
+        pass
+
+
+class NullSound:
+    def play(self):
+        pass
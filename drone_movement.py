@@ -0,0 +1,199 @@
+import math
+import time
+
+import numpy as np
+
+
+def fold(position, limit):
+    # Where a point moving freely along a line ends up inside [0, limit] when
+    # it bounces off both ends: reflections unfold into a sawtooth of period
+    # 2 * limit.
+    if limit <= 0:
+        return np.zeros_like(position)
+    return limit - np.abs(np.mod(position, 2 * limit) - limit)
+
+
+class DroneMovement:
+    # Drone state is kept as parallel NumPy arrays (one entry per drone) so
+    # every drone is advanced and bounced in a single vectorised step.
+    # Physics runs on a fixed timestep of 1 / tick_rate seconds with speeds
+    # in pixels per second: update() feeds the time since the last frame
+    # into an accumulator, runs the whole ticks it holds and interpolates
+    # x and y between the last two ticks, so drones move the same way
+    # whatever the frame rate. advance() runs ticks directly, faster than
+    # real time.
+    def __init__(self, speed_range=(90, 210), drone_count=1, drone_size=(0, 0), frame_size=(0, 0),
+                 seed=None, on_respawn=None, clock=time.time, tick_rate=120, max_frame_time=0.25):
+        self.speed_range = speed_range
+        self.drone_count = drone_count
+        self.drone_w, self.drone_h = drone_size
+        self.frame_w, self.frame_h = frame_size
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.on_respawn = on_respawn
+        self.clock = clock
+        self.tick = 1.0 / tick_rate
+        self.max_frame_time = max_frame_time
+        self.x = np.zeros(drone_count)
+        self.y = np.zeros(drone_count)
+        self.sim_x = np.zeros(drone_count)
+        self.sim_y = np.zeros(drone_count)
+        self.prev_x = np.zeros(drone_count)
+        self.prev_y = np.zeros(drone_count)
+        self.angle = np.zeros(drone_count)
+        self.speed = np.zeros(drone_count)
+        self.direction_change_time = np.zeros(drone_count)
+        self.sim_time = 0.0
+        self.accumulator = 0.0
+        self.ticks = 0
+        self.no_drone_period = False
+        self.prediction_time = 1 / 6
+        self.last_update = None
+        self.respawn()
+
+    def set_frame_size(self, frame_w, frame_h):
+        self.frame_w, self.frame_h = frame_w, frame_h
+
+    def respawn(self):
+        n = self.drone_count
+        if self.frame_w > 0:
+            self.sim_x[:] = self.rng.integers(self.drone_w, self.frame_w - self.drone_w, n, endpoint=True)
+        else:
+            self.sim_x[:] = 300
+        if self.frame_h > 0:
+            self.sim_y[:] = self.rng.integers(self.drone_h, self.frame_h - self.drone_h, n, endpoint=True)
+        else:
+            self.sim_y[:] = 200
+        self.prev_x[:] = self.x[:] = self.sim_x
+        self.prev_y[:] = self.y[:] = self.sim_y
+        self.angle[:] = self.rng.uniform(0, 2 * math.pi, n)
+        self.speed[:] = self.rng.uniform(*self.speed_range, n)
+        # Direction changes are timed on the simulation clock, which stands
+        # still while the drones are hidden.
+        self.direction_change_time[:] = self.sim_time + self.rng.uniform(0.5, 2.0, n)
+        self.accumulator = 0.0
+        self.last_update = None
+        self.no_drone_period = True
+        if self.on_respawn is not None:
+            self.on_respawn()
+
+    def update(self, now=None):
+        if self.no_drone_period:
+            return None
+        now = self.clock() if now is None else now
+        elapsed = 0.0
+        if self.last_update is not None:
+            # A long stall is not caught up in one burst of ticks.
+            elapsed = min(max(now - self.last_update, 0.0), self.max_frame_time)
+        self.last_update = now
+        return self.advance(elapsed)
+
+    def advance(self, seconds):
+        # Simulates seconds of flight at once, independent of any clock.
+        self.accumulator += seconds
+        # The epsilon keeps float error from dropping a tick now and then.
+        ticks = int(self.accumulator / self.tick + 1e-9)
+        self.accumulator -= ticks * self.tick
+        self.run_ticks(ticks)
+        self.interpolate(self.accumulator / self.tick)
+        return self.positions()
+
+    def run_ticks(self, ticks):
+        max_x, max_y = self._limits()
+        for _ in range(ticks):
+            self.prev_x[:] = self.sim_x
+            self.prev_y[:] = self.sim_y
+            self.sim_time += self.tick
+            self.ticks += 1
+
+            change = self.sim_time > self.direction_change_time
+            changed = np.count_nonzero(change)
+            if changed:
+                self.angle[change] += self.rng.uniform(-math.pi / 4, math.pi / 4, changed)
+                self.speed[change] = self.rng.uniform(*self.speed_range, changed)
+                self.direction_change_time[change] = self.sim_time + self.rng.uniform(0.5, 2.0, changed)
+
+            distance = self.speed * self.tick
+            self.sim_x += np.cos(self.angle) * distance
+            self.sim_y += np.sin(self.angle) * distance
+
+            out_x = (self.sim_x < 0) | (self.sim_x > max_x)
+            self.angle[out_x] = math.pi - self.angle[out_x]
+            np.clip(self.sim_x, 0, max_x, out=self.sim_x)
+            out_y = (self.sim_y < 0) | (self.sim_y > max_y)
+            self.angle[out_y] = -self.angle[out_y]
+            np.clip(self.sim_y, 0, max_y, out=self.sim_y)
+
+    def interpolate(self, alpha):
+        # Render positions between the last two ticks.
+        np.multiply(self.sim_x - self.prev_x, alpha, out=self.x)
+        self.x += self.prev_x
+        np.multiply(self.sim_y - self.prev_y, alpha, out=self.y)
+        self.y += self.prev_y
+
+    def positions(self):
+        return list(zip(self.x.astype(int).tolist(), self.y.astype(int).tolist()))
+
+    def predict(self, seconds):
+        # Top-left positions as float arrays after seconds at the current
+        # heading, with wall bounces applied analytically; negative seconds
+        # look back along it.
+        max_x, max_y = self._limits()
+        distance = self.speed * seconds
+        return (fold(self.x + np.cos(self.angle) * distance, max_x),
+                fold(self.y + np.sin(self.angle) * distance, max_y))
+
+    def predict_ahead(self, seconds):
+        if self.no_drone_period:
+            return self.positions()
+        predicted_x, predicted_y = self.predict(seconds)
+        return list(zip(predicted_x.astype(int).tolist(), predicted_y.astype(int).tolist()))
+
+    def predict_position(self):
+        return self.predict_ahead(self.prediction_time)
+
+    def get_predicted_center(self):
+        return [(pred[0] + self.drone_w // 2, pred[1] + self.drone_h // 2) for pred in self.predict_position()]
+
+    def get_current_center(self):
+        return [(x + self.drone_w // 2, y + self.drone_h // 2) for x, y in self.positions()]
+
+    def center_arrays(self, seconds=None):
+        # Current and predicted centres as (n, 2) int arrays, the same values
+        # as get_current_center() and get_predicted_center(). seconds
+        # overrides prediction_time as the prediction horizon.
+        offset = (self.drone_w // 2, self.drone_h // 2)
+        current = np.column_stack([self.x.astype(int), self.y.astype(int)]) + offset
+        if self.no_drone_period:
+            return current, current.copy()
+        predicted_x, predicted_y = self.predict(self.prediction_time if seconds is None else seconds)
+        return current, np.column_stack([predicted_x.astype(int), predicted_y.astype(int)]) + offset
+
+    def _limits(self):
+        return max(0, self.frame_w - self.drone_w), max(0, self.frame_h - self.drone_h)
+
+
+def benchmark(seconds=10.0, drone_counts=(3, 300)):
+    # Distance flown in the same simulated time at different frame rates,
+    # and how fast advance() runs the simulation without rendering.
+    for fps in (20, 60, 144):
+        movement = DroneMovement(drone_count=3, drone_size=(144, 144), frame_size=(1280, 720), seed=1)
+        movement.no_drone_period = False
+        flown = 0.0
+        for frame in range(int(seconds * fps) + 1):
+            x, y = movement.x.copy(), movement.y.copy()
+            movement.update(frame / fps)
+            flown += np.hypot(movement.x - x, movement.y - y).sum()
+        print(f"{fps:3d} FPS: {movement.ticks} ticks, drones flew {flown:.0f} px in {seconds:.0f} s")
+    for count in drone_counts:
+        movement = DroneMovement(drone_count=count, drone_size=(144, 144), frame_size=(1280, 720), seed=1)
+        movement.no_drone_period = False
+        start = time.perf_counter()
+        movement.advance(seconds * 10)
+        elapsed = time.perf_counter() - start
+        print(f"{count} drones: {seconds * 10:.0f} s simulated in {elapsed * 1000:.0f} ms "
+              f"({seconds * 10 / elapsed:.0f}x real time)")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,444 @@
+import json
+import math
+import secrets
+import time
+
+import cv2
+
+from compositing import SpriteCompositor
+from detector import RateMeter
+from drone_movement import DroneMovement
+from hit_index import HitIndex
+from input_events import CrosshairMotion, InputQueue, held_names
+from overlay import Overlay
+from results_store import open_results
+from profiler import StageTimer, draw_profiler
+from scheduler import LaserController, Scheduler
+from servo import ServoChannel
+from servo_map import ServoMap
+from tracker import MultiTracker
+
+STAGES = ["capture", "compose", "detect", "overlay", "display"]
+
+
+def load_calibration(filename='calibration_data.json'):
+    with open(filename, 'r') as f:
+        calibration_data = json.load(f)
+    return calibration_data
+
+def log_game_results(path, results, shots=(), operator=""):
+    # Appends the game and its shots to the results database.
+    with open_results(path) as store:
+        store.add_session(*results, shots=shots, operator=operator)
+
+def drone_speed_range(difficulty_level):
+    # px/s: the old 3-7 and 5-10 px per frame at 30 FPS.
+    return (90, 210) if difficulty_level == 1 else (150, 300)
+
+def calculate_shot_accuracy(shot_x, shot_y, current_center, predicted_center, drone_w, drone_h):
+    current_distance = math.sqrt((shot_x - current_center[0]) ** 2 + (shot_y - current_center[1]) ** 2)
+    predicted_distance = math.sqrt((shot_x - predicted_center[0]) ** 2 + (shot_y - predicted_center[1]) ** 2)
+    max_distance = math.sqrt(drone_w ** 2 + drone_h ** 2) / 2
+
+    if predicted_distance < current_distance:
+        accuracy = max(0, 100 * (1 - predicted_distance / max_distance))
+    else:
+        accuracy = max(0, 70 * (1 - current_distance / max_distance))
+
+    return min(100, accuracy)
+
+def draw_crosshair(frame, x, y, size=20, color=(0, 0, 255)):
+    cv2.line(frame, (x - size, y), (x + size, y), color, 2)
+    cv2.line(frame, (x, y - size), (x, y + size), color, 2)
+    cv2.circle(frame, (x, y), 2, color, -1)
+
+def check_drone_zone(crosshair_x, middle_x):
+    if crosshair_x < middle_x:
+        return "Warning! Drone destroyed in a high-risk zone. Risk to people or buildings."
+    else:
+        return "Target destroyed in a safe zone. Continue operation."
+
+
+class GameEngine:
+    # One game session. Everything that touches the outside world is passed
+    # in: frame_source (read() -> CapturedFrame or None), detector (submit /
+    # latest / fps / stop), board (get_pin), display (attach / poll / show /
+    # close) and sound (play). The display pushes all input into one
+    # InputQueue, applied in time order at the start of each step. All game
+    # logic within a frame runs on self.now, read from clock once per step,
+    # so a recorder can capture a session and replay.py can re-run it exactly.
+    def __init__(self, config, difficulty_level, num_drones, calibration_data, drone_rgb, drone_alpha,
+                 background_image, frame_source, detector, board, display, sound, timer=None,
+                 clock=time.time, recorder=None):
+        self.config = config
+        self.clock = clock
+        self.now = clock()
+        self.recorder = recorder
+        self.seed = config["seed"] if config["seed"] is not None else secrets.randbits(32)
+        self.difficulty_level = difficulty_level
+        self.num_drones = num_drones
+        self.background_image = background_image
+        self.frame_source = frame_source
+        self.detector = detector
+        self.display = display
+        self.sound = sound
+        if timer is None:
+            timer = StageTimer(STAGES, history=1000, log_path=config["timing_log"])
+        self.timer = timer
+        self.show_profiler = config["profiler_overlay"]
+
+        self.drone_h, self.drone_w = drone_rgb.shape[:2]
+        self.compositor = SpriteCompositor(drone_rgb, drone_alpha)
+        self.hit_index = HitIndex(self.drone_w, self.drone_h)
+        self.overlay = Overlay()
+        self.stats_text = ""
+        self.stats_time = 0.0
+        self.tracker = MultiTracker()
+        self.render_meter = RateMeter()
+
+        self.servo_map = ServoMap.from_calibration(calibration_data)
+        # Seconds from the servo pin write to the turret standing still, as
+        # measured by auto-calibration or latency_probe.py --apply; the
+        # command latency before the write is servo_latency (laser_latency
+        # for the laser).
+        self.settle_time = calibration_data.get("settle_time", config["servo_settle_time"])
+
+        self.servo_channel = ServoChannel(board.get_pin('d:9:s'), board.get_pin('d:10:s'), board.get_pin('d:3:o'),
+                                          rate_hz=config["servo_rate_hz"]).start()
+        self.servo_channel.aim(90, 70)
+        self.servo_channel.set_laser(0)
+        self.servo_command = (90, 70)
+        self.laser_on = 0
+        self.servo_latency = 0.0
+        self.laser_latency = 0.0
+        self.lead_time = self.settle_time
+
+        self.scheduler = Scheduler(clock=lambda: self.now)
+        self.laser = LaserController(self.scheduler, self.set_laser,
+                                     pulse_width=config["laser_pulse_width"],
+                                     cooldown=config["laser_cooldown"],
+                                     max_queued=config["laser_max_queued"])
+
+        self.auto_aim = False
+        self.score = 0
+        self.crosshair_x = 640
+        self.crosshair_y = 360
+        self.drone_active = True
+        self.frame_w, self.frame_h = 0, 0
+        self.frame_id = 0
+        self.explosion_effect = False
+        self.explosion_start_time = 0
+        self.explosion_duration = 0.3
+        self.explosion_pos = (0, 0)
+        self.drone_respawn_delay = 1.0
+        self.drone_respawn_event = None
+        self.current_accuracy = 0
+        self.accuracy_display_time = 0
+        self.accuracy_display_duration = 2.0
+        self.use_background = False
+        self.zone_message = ""
+        self.zone_message_event = None
+        self.shots_fired = 0
+        self.game_start_time = self.now
+        self.accuracy_list = []
+        self.shot_log = []
+        self.pending_shots = []
+        self.drones_visible_at = None
+        self.quit_by_user = False
+        self.input = InputQueue(clock)
+        self.input.listeners.append(self.follow_mouse)
+        self.frame_events = []
+        self.held_keys = set()
+        self.motion = CrosshairMotion(config["crosshair_speed"])
+        self.motion_time = self.now
+
+        self.drone_movement = DroneMovement(speed_range=drone_speed_range(difficulty_level),
+                                            drone_count=num_drones, drone_size=(self.drone_w, self.drone_h),
+                                            seed=self.seed, on_respawn=self.start_respawn_delay,
+                                            clock=lambda: self.now, tick_rate=config["physics_rate"])
+        display.attach(self.input)
+        if recorder is not None:
+            recorder.start(self)
+
+    def servo_angles(self, x, y):
+        if self.servo_map.lut_size != (self.frame_w, self.frame_h):
+            self.servo_map.build_lut(self.frame_w, self.frame_h)
+        return self.servo_map.angles(x, y)
+
+    def aim(self):
+        if self.frame_w > 0 and self.frame_h > 0:
+            self.servo_command = self.servo_angles(self.crosshair_x, self.crosshair_y)
+            self.servo_channel.aim(*self.servo_command)
+
+    def set_laser(self, value):
+        self.laser_on = value
+        self.servo_channel.set_laser(value)
+
+    def read_servo_latency(self):
+        return self.servo_channel.latency
+
+    def read_laser_latency(self):
+        return self.servo_channel.laser_latency
+
+    def start_respawn_delay(self):
+        self.scheduler.cancel(self.drone_respawn_event)
+        self.drone_respawn_event = self.scheduler.call_later(self.drone_respawn_delay, self.end_respawn_delay)
+
+    def end_respawn_delay(self):
+        self.drone_movement.no_drone_period = False
+        self.drones_visible_at = self.now
+
+    def end_explosion(self):
+        self.explosion_effect = False
+
+    def clear_zone_message(self):
+        self.zone_message = ""
+
+    def start_explosion(self, pos):
+        self.explosion_effect = True
+        self.explosion_start_time = self.scheduler.now
+        self.explosion_pos = pos
+        self.scheduler.call_later(self.explosion_duration, self.end_explosion)
+        if self.use_background:
+            self.zone_message = check_drone_zone(self.crosshair_x, self.frame_w // 2)
+            self.scheduler.cancel(self.zone_message_event)
+            self.zone_message_event = self.scheduler.call_later(self.explosion_duration + 5, self.clear_zone_message)
+
+    def queue_shot(self):
+        # Called when a laser pulse starts; the shot is resolved with the
+        # others of this frame once the scheduler has run.
+        self.sound.play()
+        self.pending_shots.append((self.crosshair_x, self.crosshair_y))
+
+    def resolve_shots(self):
+        # All shots of a frame are tested together against one index of the
+        # drone boxes. Auto-aim hits the box predicted lead_time ahead, where
+        # it aimed; manual aim the current one. The nearest drone wins and
+        # accuracy is measured against that drone's own prediction. A hit
+        # respawns every drone, so later shots in the same frame miss.
+        shots, self.pending_shots = self.pending_shots, []
+        movement = self.drone_movement
+        hits = [-1] * len(shots)
+        if not movement.no_drone_period:
+            self.hit_index.build(*movement.center_arrays(self.lead_time if self.auto_aim else None))
+            xs, ys = zip(*shots)
+            hits = self.hit_index.query(xs, ys, predicted=self.auto_aim)[0].tolist()
+        for (x, y), drone in zip(shots, hits):
+            self.resolve_shot(x, y, drone if not movement.no_drone_period else -1)
+
+    def resolve_shot(self, x, y, drone):
+        reaction_time = None
+        if not self.drone_movement.no_drone_period and self.drones_visible_at is not None:
+            reaction_time = self.now - self.drones_visible_at
+        hit = drone >= 0
+
+        if hit:
+            current_center = tuple(int(v) for v in self.hit_index.current[drone])
+            predicted_center = tuple(int(v) for v in self.hit_index.predicted[drone])
+            if self.auto_aim:
+                self.current_accuracy = 100
+            else:
+                self.current_accuracy = calculate_shot_accuracy(x, y, current_center, predicted_center,
+                                                                self.drone_w, self.drone_h)
+            if self.current_accuracy > 0:
+                self.accuracy_list.append(self.current_accuracy)
+            self.score += 1
+            self.start_explosion(predicted_center if self.auto_aim else current_center)
+            self.drone_movement.respawn()
+        else:
+            self.current_accuracy = 0
+
+        self.accuracy_display_time = self.now
+        self.shot_log.append({
+            "time": self.now - self.game_start_time,
+            "x": x,
+            "y": y,
+            "hit": hit,
+            "accuracy": self.current_accuracy if hit else 0.0,
+            "zone": ("risk" if x < self.frame_w // 2 else "safe") if hit else None,
+            "auto_aim": self.auto_aim,
+            "reaction_time": reaction_time,
+        })
+
+    def follow_mouse(self, event):
+        # Runs as the event is pushed, so the turret starts moving before the
+        # game applies the event on the next step.
+        if event.kind == "move" and not self.auto_aim and self.frame_w > 0 and self.frame_h > 0:
+            self.servo_channel.aim(*self.servo_angles(event.x, event.y))
+
+    def handle_input(self):
+        # Applies the queued events in time order; held keys move the
+        # crosshair for the time between them.
+        running = True
+        self.frame_events = self.input.drain()
+        for event in self.frame_events:
+            self.move_crosshair(min(event.time, self.now))
+            kind = event.kind
+            if kind == "move":
+                self.crosshair_x, self.crosshair_y = event.x, event.y
+            elif kind in ("click", "fire"):
+                if self.laser.fire(self.queue_shot):
+                    self.shots_fired += 1
+            elif kind == "hold":
+                self.held_keys = held_names(event.key)
+            elif kind == "key":
+                running = self.handle_key(event.key) and running
+            elif kind == "quit":
+                running = False
+        self.move_crosshair(self.now)
+        self.aim()
+        return running
+
+    def move_crosshair(self, until):
+        seconds = until - self.motion_time
+        if seconds <= 0:
+            return
+        self.motion_time = until
+        dx, dy = self.motion.advance(self.held_keys, seconds)
+        if (dx or dy) and self.frame_w > 0 and self.frame_h > 0:
+            self.crosshair_x = max(0, min(self.crosshair_x + dx, self.frame_w - 1))
+            self.crosshair_y = max(0, min(self.crosshair_y + dy, self.frame_h - 1))
+
+    def handle_key(self, key):
+        if key == ord('q'):
+            self.quit_by_user = True
+            return False
+        elif key == ord(' '):
+            self.auto_aim = not self.auto_aim
+        elif key == ord('e'):
+            self.use_background = not self.use_background
+        elif key == ord('p'):
+            self.show_profiler = not self.show_profiler
+        return True
+
+    def step(self):
+        timer = self.timer
+        timer.start_frame()
+        self.now = self.clock()
+        self.servo_latency = self.read_servo_latency()
+        self.laser_latency = self.read_laser_latency()
+        # Auto-aim aims this far ahead, and its shots are judged against the
+        # drone boxes at the same horizon: the turret has to get there and
+        # settle, and the laser command has to reach the pin.
+        self.lead_time = self.servo_latency + self.settle_time + self.laser_latency
+
+        self.display.poll()
+        running = self.handle_input()
+
+        self.scheduler.run_pending(self.now)
+        if self.pending_shots:
+            self.resolve_shots()
+
+        if self.use_background:
+            source = self.background_image
+        else:
+            captured = self.frame_source.read()
+            if captured is None:
+                return False
+            source = captured.image
+        timer.lap("capture")
+
+        self.frame_h, self.frame_w = source.shape[:2]
+        self.drone_movement.set_frame_size(self.frame_w, self.frame_h)
+
+        updated_positions = None
+        if self.drone_active:
+            updated_positions = self.drone_movement.update(self.now)
+        frame = self.compositor.compose(source, updated_positions or ())
+
+        if self.explosion_effect:
+            progress = min(1.0, (self.scheduler.now - self.explosion_start_time) / self.explosion_duration)
+            radius = int(50 * progress)
+            self.overlay.explosion(frame, self.explosion_pos[0], self.explosion_pos[1], radius)
+
+        if self.use_background and self.zone_message:
+            self.overlay.text(frame, self.zone_message, (self.frame_w // 2 - 400, self.frame_h // 2 + 100),
+                              1.5, (0, 0, 255), 3)
+        timer.lap("compose")
+
+        regions = None
+        if self.config["roi_detection"]:
+            # Where the tracked drones should be in this frame.
+            regions = [track.center(self.now) for track in self.tracker.confirmed()]
+        self.detector.submit(frame, self.frame_id, regions, self.now)
+        detection = self.detector.latest()
+        self.tracker.update(detection.boxes, detection.scores, detection.timestamp, detection.frame_id)
+        self.frame_id += 1
+
+        target = None
+        now = self.now
+        if not self.drone_movement.no_drone_period:
+            target = self.tracker.best_target(self.crosshair_x, self.crosshair_y, now)
+            if self.auto_aim and self.drone_active and target is not None:
+                target_x, target_y = target.center(now + self.lead_time)
+                self.crosshair_x = int(max(0, min(target_x, self.frame_w - 1)))
+                self.crosshair_y = int(max(0, min(target_y, self.frame_h - 1)))
+                self.aim()
+        timer.lap("detect")
+
+        if target is not None and self.auto_aim and self.drone_active:
+            for track in self.tracker.confirmed():
+                x1, y1, x2, y2 = map(int, track.box(now))
+                color = (0, 0, 255) if track is target else (0, 255, 0)
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                cv2.putText(frame, f"#{track.id}", (x1, y1 - 5),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+        self.draw_hud(frame)
+        if self.show_profiler:
+            draw_profiler(frame, timer, self.render_meter.rate())
+        timer.lap("overlay")
+
+        self.display.show(frame)
+        if self.recorder is not None:
+            self.recorder.record_frame(self, source, detection)
+        timer.lap("display")
+        timer.end_frame()
+        return running
+
+    def draw_hud(self, frame):
+        draw_crosshair(frame, self.crosshair_x, self.crosshair_y)
+
+        overlay = self.overlay
+        overlay.text(frame, f'Score: {self.score}', (10, 30), 1, (0, 255, 0), 2)
+
+        aim_status = "Auto-aim: ON" if self.auto_aim else "Auto-aim: OFF"
+        if not self.detector.ready():
+            aim_status += " (detector loading...)"
+        overlay.text(frame, aim_status, (10, 60), 1, (0, 255, 0), 2)
+
+        if self.now - self.accuracy_display_time < self.accuracy_display_duration:
+            accuracy_text = f"Accuracy: {self.current_accuracy:.1f}%"
+            overlay.text(frame, accuracy_text, (10, 90), 1, (0, 255, 0), 2)
+
+        if self.drone_movement.no_drone_period or self.laser.reloading():
+            overlay.text(frame, "RELOADING...", (self.frame_w // 2 - 100, self.frame_h // 2), 1.5, (0, 0, 255), 3)
+
+        self.render_meter.tick(self.now)
+        if self.config["show_stats"]:
+            # Refreshed a few times a second so its sprite is not re-rendered every frame.
+            if self.now - self.stats_time >= 0.25:
+                self.stats_time = self.now
+                self.stats_text = f"Render FPS: {self.render_meter.rate():.1f}  Detect FPS: {self.detector.fps():.1f}"
+            overlay.text(frame, self.stats_text, (10, self.frame_h - 20), 0.7, (255, 255, 255), 2)
+
+    def run(self, max_frames=None):
+        frames = 0
+        while self.step():
+            frames += 1
+            if max_frames is not None and frames >= max_frames:
+                break
+        return frames
+
+    def results(self):
+        return (self.score, self.shots_fired, self.accuracy_list, self.now - self.game_start_time,
+                self.difficulty_level, self.num_drones, self.auto_aim)
+
+    def close(self):
+        self.detector.stop()
+        self.servo_channel.set_laser(0)
+        self.servo_channel.stop()
+        self.display.close()
+        self.timer.close()
+        if self.recorder is not None:
+            self.recorder.close()
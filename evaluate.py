@@ -0,0 +1,317 @@
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import numpy as np
+
+from drone_movement import DroneMovement
+from engine import calculate_shot_accuracy, drone_speed_range
+from hit_index import HitIndex
+from tracker import MultiTracker
+
+FRAME_SIZE = (1280, 720)
+DRONE_SIZE = (144, 144)
+
+DEFAULTS = {
+    "shooter": "auto",
+    "difficulty_level": 1,
+    "speed_range": None,  # px/s; None uses the difficulty level's range
+    "num_drones": 3,
+    "prediction_time": 1 / 6,  # the prediction manual-aim accuracy is measured against
+    "respawn_delay": 1.0,
+    "duration": 60.0,
+    "frame_rate": 30,
+    "physics_rate": 120,
+    "pulse_width": 0.25,
+    "cooldown": 0.25,
+    # auto shooter: how old a detection is when the tracker gets it, box
+    # corner noise in px and the chance a drone is missed in a frame; the
+    # true command + settle latency of the turret (mean and jitter) and the
+    # lead the engine aims and judges hits with (servo_latency +
+    # settle_time), None for a lead that matches the true latency
+    "detect_latency": 0.05,
+    "detect_noise": 4.0,
+    "detect_miss_rate": 0.05,
+    "latency": 0.15,
+    "latency_jitter": 0.02,
+    "lead": None,
+    # scripted shooter: median reaction time, how old the position the player
+    # sees is, how quickly the hand follows it, hand jitter in px per frame
+    # and how close it waits to get before firing, as a fraction of the half
+    # box
+    "reaction_time": 0.35,
+    "perception_delay": 0.1,
+    "aim_lag": 0.12,
+    "aim_jitter": 15.0,
+    "fire_tolerance": 1.0,
+}
+
+
+class AutoShooter:
+    # The game's auto-aim through the game's tracker. Every frame the tracker
+    # gets the noisy detections of detect_latency ago, and the crosshair goes
+    # to the best target extrapolated lead seconds past now; the laser fires
+    # whenever there is a target and it is ready.
+    def __init__(self, settings, rng):
+        self.tracker = MultiTracker()
+        self.latency = settings["detect_latency"]
+        self.noise = settings["detect_noise"]
+        self.miss_rate = settings["detect_miss_rate"]
+        self.lead = settings["lead"]
+        self.rng = rng
+        self.frames = deque()
+        self.frame_id = 0
+
+    def aim(self, movement, crosshair, now, visible_since):
+        boxes = np.empty((0, 4))
+        if not movement.no_drone_period:
+            seen = self.rng.random(movement.drone_count) >= self.miss_rate
+            boxes = np.column_stack([movement.x, movement.y, movement.x + DRONE_SIZE[0],
+                                     movement.y + DRONE_SIZE[1]])[seen]
+            boxes = boxes + self.rng.normal(0, self.noise, boxes.shape)
+        self.frames.append((now, self.frame_id, boxes))
+        self.frame_id += 1
+        while self.frames and self.frames[0][0] <= now - self.latency + 1e-9:
+            captured_at, frame_id, boxes = self.frames.popleft()
+            self.tracker.update(boxes, np.full(len(boxes), 0.9), captured_at, frame_id)
+        if movement.no_drone_period:
+            return crosshair, False
+        target = self.tracker.best_target(crosshair[0], crosshair[1], now)
+        if target is None:
+            return crosshair, False
+        return target.center(now + self.lead), True
+
+
+class ScriptedShooter:
+    # A player aiming by hand: after a reaction time drawn around
+    # reaction_time, the crosshair chases where the target nearest to it was
+    # perception_delay ago with a first-order lag of aim_lag seconds plus
+    # jitter, and fires once it is within fire_tolerance of the half box of
+    # that position.
+    def __init__(self, settings, rng):
+        self.reaction = settings["reaction_time"]
+        self.delay = settings["perception_delay"]
+        self.lag = settings["aim_lag"]
+        self.jitter = settings["aim_jitter"]
+        self.tolerance = settings["fire_tolerance"] * DRONE_SIZE[0] / 2
+        self.dt = 1.0 / settings["frame_rate"]
+        self.rng = rng
+        self.react_at = None
+
+    def aim(self, movement, crosshair, now, visible_since):
+        if movement.no_drone_period:
+            return crosshair, False
+        if self.react_at is None or self.react_at < visible_since:
+            self.react_at = visible_since + self.reaction * self.rng.lognormal(0, 0.3)
+        if now < self.react_at:
+            return crosshair, False
+        x, y = movement.predict(-self.delay)
+        seen = np.column_stack([x, y]) + (DRONE_SIZE[0] // 2, DRONE_SIZE[1] // 2)
+        target = seen[np.argmin(np.hypot(*(seen - crosshair).T))]
+        crosshair = crosshair + (target - crosshair) * (1 - math.exp(-self.dt / self.lag))
+        crosshair = crosshair + self.rng.normal(0, self.jitter, 2)
+        return crosshair, bool(np.hypot(*(crosshair - target)) < self.tolerance)
+
+
+SHOOTERS = {"auto": AutoShooter, "scripted": ScriptedShooter}
+
+
+def arrival_accuracy(x, y, center):
+    # calculate_shot_accuracy's scale for a shot at the predicted position:
+    # 100 at the drone's centre, 0 at its corners.
+    distance = math.hypot(x - center[0], y - center[1])
+    return max(0.0, 100 * (1 - distance / (math.hypot(*DRONE_SIZE) / 2)))
+
+
+def run_session(settings, seed):
+    # One game of settings["duration"] seconds with the engine's rules: shots
+    # need a ready laser, a hit respawns every drone and they reappear after
+    # respawn_delay. Manual shots hit the current box. An auto-aim shot hits
+    # when the laser, arriving after the true latency, lands on a drone's box
+    # there; its accuracy is how close to the centre. The game itself scores
+    # auto-aim against the box lead seconds ahead and shows 100 for every
+    # hit; shots it would have scored are counted apart. Returns (shots,
+    # shots the game scores, accuracies of hits, times to kill).
+    rng = np.random.default_rng(seed)
+    auto_aim = settings["shooter"] == "auto"
+    shooter = SHOOTERS[settings["shooter"]](settings, rng)
+    state = {"visible_at": settings["respawn_delay"]}
+    now = 0.0
+
+    def on_respawn():
+        state["visible_at"] = now + settings["respawn_delay"]
+
+    movement = DroneMovement(speed_range=settings["speed_range"] or drone_speed_range(settings["difficulty_level"]),
+                             drone_count=settings["num_drones"], drone_size=DRONE_SIZE, frame_size=FRAME_SIZE,
+                             seed=int(rng.integers(2 ** 32)), on_respawn=on_respawn,
+                             tick_rate=settings["physics_rate"])
+    movement.prediction_time = settings["prediction_time"]
+    hit_index = HitIndex(*DRONE_SIZE)
+    crosshair = np.array([FRAME_SIZE[0] / 2, FRAME_SIZE[1] / 2])
+    frame_time = 1.0 / settings["frame_rate"]
+    ready_at = 0.0
+    visible_since = 0.0
+    shots = scored = 0
+    accuracies = []
+    kill_times = []
+    for frame in range(int(settings["duration"] * settings["frame_rate"])):
+        now = frame * frame_time
+        if movement.no_drone_period and now >= state["visible_at"]:
+            movement.no_drone_period = False
+            visible_since = now
+        if not movement.no_drone_period:
+            movement.update(now)
+        crosshair, fire = shooter.aim(movement, crosshair, now, visible_since)
+        crosshair = np.clip(crosshair, 0, (FRAME_SIZE[0] - 1, FRAME_SIZE[1] - 1))
+        if not fire or now < ready_at:
+            continue
+        shots += 1
+        ready_at = now + settings["pulse_width"] + settings["cooldown"]
+        x, y = int(crosshair[0]), int(crosshair[1])
+        if auto_aim:
+            # The game scores the shot against the box lead seconds ahead;
+            # the drone is hit only if the laser lands on it after the true
+            # latency.
+            hit_index.build(*movement.center_arrays(settings["lead"]))
+            scored += hit_index.nearest(x, y, predicted=True)[0] >= 0
+            arrival = max(0.0, rng.normal(settings["latency"], settings["latency_jitter"]))
+            current, predicted = movement.center_arrays(arrival)
+        else:
+            current, predicted = movement.center_arrays()
+        hit_index.build(current, predicted)
+        drone, _ = hit_index.nearest(x, y, predicted=auto_aim)
+        if drone < 0:
+            continue
+        if auto_aim:
+            accuracies.append(arrival_accuracy(x, y, predicted[drone]))
+        else:
+            scored += 1
+            accuracies.append(calculate_shot_accuracy(x, y, current[drone], predicted[drone], *DRONE_SIZE))
+        kill_times.append(now - visible_since)
+        movement.respawn()
+    return shots, scored, accuracies, kill_times
+
+
+def session_seed(seed, config_index, session):
+    # Independent of how sessions are split between workers.
+    return np.random.SeedSequence(seed, spawn_key=(config_index, session)).generate_state(1)[0]
+
+
+def run_batch(task):
+    config_index, settings, seed, sessions = task
+    shots = scored = 0
+    accuracies = []
+    kill_times = []
+    for session in sessions:
+        session_shots, session_scored, session_accuracies, session_kills = \
+            run_session(settings, session_seed(seed, config_index, session))
+        shots += session_shots
+        scored += session_scored
+        accuracies.extend(session_accuracies)
+        kill_times.extend(session_kills)
+    return config_index, len(sessions), shots, scored, accuracies, kill_times
+
+
+def summarize(settings, sessions, shots, scored, accuracies, kill_times):
+    hits = len(accuracies)
+    accuracies = np.asarray(accuracies) if hits else np.zeros(1)
+    kill_times = np.asarray(kill_times) if hits else np.full(1, np.nan)
+    return dict(settings, sessions=sessions, shots=shots, hits=hits, hit_rate=hits / shots if shots else 0.0,
+                scored_rate=scored / shots if shots else 0.0,
+                accuracy_mean=float(accuracies.mean()), accuracy_p10=float(np.percentile(accuracies, 10)),
+                accuracy_p50=float(np.percentile(accuracies, 50)), accuracy_p90=float(np.percentile(accuracies, 90)),
+                ttk_p50=float(np.percentile(kill_times, 50)), ttk_p90=float(np.percentile(kill_times, 90)),
+                kills_per_minute=hits / (sessions * settings["duration"] / 60))
+
+
+def evaluate(configs, sessions=200, seed=0, workers=None, batch=25):
+    # configs: dicts of overrides of DEFAULTS. Sessions run in batches of
+    # batch on a process pool; every session's seed depends only on seed,
+    # the config's position and the session number.
+    configs = [dict(DEFAULTS, **config) for config in configs]
+    for config in configs:
+        if config["lead"] is None:
+            config["lead"] = config["latency"]
+    tasks = [(i, config, seed, range(start, min(start + batch, sessions)))
+             for i, config in enumerate(configs) for start in range(0, sessions, batch)]
+    totals = [[0, 0, 0, [], []] for _ in configs]
+    with Pool(workers) as pool:
+        for config_index, count, shots, scored, accuracies, kill_times in pool.imap_unordered(run_batch, tasks):
+            total = totals[config_index]
+            total[0] += count
+            total[1] += shots
+            total[2] += scored
+            total[3].extend(accuracies)
+            total[4].extend(kill_times)
+    # Sorted so the result does not depend on the order batches finished in.
+    return [summarize(config, count, shots, scored, sorted(accuracies), sorted(kill_times))
+            for config, (count, shots, scored, accuracies, kill_times) in zip(configs, totals)]
+
+
+def format_results(results, keys):
+    lines = ["".join(f"{key:>17}" for key in keys) +
+             f"{'hit rate':>10}{'scored':>8}{'acc mean':>10}{'acc p10':>9}{'acc p50':>9}{'ttk p50':>9}{'ttk p90':>9}{'kills/min':>11}"]
+    for row in results:
+        lines.append("".join(f"{row[key]!s:>17}" if not isinstance(row[key], float) else f"{row[key]:>17.3g}"
+                             for key in keys) +
+                     f"{row['hit_rate'] * 100:>9.1f}%{row['scored_rate'] * 100:>7.1f}%{row['accuracy_mean']:>10.1f}{row['accuracy_p10']:>9.1f}"
+                     f"{row['accuracy_p50']:>9.1f}{row['ttk_p50']:>9.2f}{row['ttk_p90']:>9.2f}"
+                     f"{row['kills_per_minute']:>11.1f}")
+    return "\n".join(lines)
+
+
+def export(path, results):
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte-Carlo evaluation of shooters and difficulty settings.")
+    parser.add_argument("--shooter", nargs="+", default=["auto", "scripted"], choices=sorted(SHOOTERS))
+    parser.add_argument("--difficulty", nargs="+", type=int, default=[1, 2])
+    parser.add_argument("--drones", nargs="+", type=int, default=[3])
+    parser.add_argument("--prediction-time", nargs="+", type=float, default=[DEFAULTS["prediction_time"]])
+    parser.add_argument("--respawn-delay", nargs="+", type=float, default=[DEFAULTS["respawn_delay"]])
+    parser.add_argument("--latency", nargs="+", type=float, default=[DEFAULTS["latency"]],
+                        help="true turret latency, s")
+    parser.add_argument("--lead", nargs="+", type=float, default=[DEFAULTS["lead"]],
+                        help="auto-aim lead, s (default: the true latency)")
+    parser.add_argument("--sessions", type=int, default=200, help="simulated games per configuration")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds per game")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="processes (default: every core)")
+    parser.add_argument("--output", help="write results to a .json or .csv file")
+    args = parser.parse_args(argv)
+
+    grid = {"shooter": args.shooter, "difficulty_level": args.difficulty, "num_drones": args.drones,
+            "prediction_time": args.prediction_time, "respawn_delay": args.respawn_delay,
+            "latency": args.latency, "lead": args.lead}
+    keys = list(grid)
+    configs = [dict(zip(keys, values), duration=args.duration) for values in itertools.product(*grid.values())]
+    # Only the swept settings are shown.
+    keys = [key for key in keys if len(grid[key]) > 1] or ["shooter"]
+    start = time.perf_counter()
+    results = evaluate(configs, args.sessions, args.seed, args.workers)
+    elapsed = time.perf_counter() - start
+    print(format_results(results, keys))
+    simulated = len(configs) * args.sessions * args.duration
+    print(f"{len(configs) * args.sessions} sessions ({simulated / 3600:.1f} h of play) in {elapsed:.1f} s "
+          f"on {args.workers or os.cpu_count()} workers")
+    if args.output:
+        export(args.output, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import time
+
+import numpy as np
+
+# Grid cells are packed into one int64 key; the offset keeps boxes hanging
+# off the left or top edge of the frame positive.
+CELL_OFFSET = 1 << 20
+
+
+class HitIndex:
+    # Uniform grid over the drone boxes for hit-testing shots. Each drone's
+    # current and predicted box is entered in every cell it overlaps; with
+    # cells at least as large as a box that is at most four cells per box,
+    # so a shot only tests the few drones listed in its own cell however
+    # many drones there are. build() once per frame, then query() any number
+    # of shots against it in one vectorised pass.
+    def __init__(self, box_w, box_h, cell_size=None):
+        self.half_w = box_w // 2
+        self.half_h = box_h // 2
+        self.cell = cell_size or max(box_w, box_h, 1)
+        self.build(np.empty((0, 2)), np.empty((0, 2)))
+
+    def build(self, current, predicted):
+        # current, predicted: (n, 2) box centres, row i for drone i.
+        self.current = np.asarray(current, dtype=np.float64).reshape(-1, 2)
+        self.predicted = np.asarray(predicted, dtype=np.float64).reshape(-1, 2)
+        count = len(self.current)
+        centers = np.concatenate([self.current, self.predicted])
+        drones = np.tile(np.arange(count), 2)
+        x0 = np.floor((centers[:, 0] - self.half_w) / self.cell).astype(np.int64)
+        x1 = np.floor((centers[:, 0] + self.half_w) / self.cell).astype(np.int64)
+        y0 = np.floor((centers[:, 1] - self.half_h) / self.cell).astype(np.int64)
+        y1 = np.floor((centers[:, 1] + self.half_h) / self.cell).astype(np.int64)
+        keys = np.concatenate([cell_keys(x, y) for x in (x0, x1) for y in (y0, y1)])
+        drones = np.tile(drones, 4)
+        # Sorted by cell, then drone; repeats of a pair are dropped so every
+        # candidate is tested once.
+        order = np.lexsort((drones, keys))
+        keys, drones = keys[order], drones[order]
+        keep = np.ones(len(keys), dtype=bool)
+        keep[1:] = (keys[1:] != keys[:-1]) | (drones[1:] != drones[:-1])
+        self.keys = keys[keep]
+        self.entries = drones[keep]
+
+    def query(self, xs, ys, predicted=False):
+        # For each shot the index of the drone whose box (the predicted box
+        # when predicted is set) contains it and whose centre is nearest, or
+        # -1 for a miss, and the distance to that centre.
+        xs = np.asarray(xs, dtype=np.float64).ravel()
+        ys = np.asarray(ys, dtype=np.float64).ravel()
+        hits = np.full(len(xs), -1, dtype=np.int64)
+        distances = np.full(len(xs), np.inf)
+        if not len(self.keys) or not len(xs):
+            return hits, distances
+        keys = cell_keys(np.floor(xs / self.cell).astype(np.int64), np.floor(ys / self.cell).astype(np.int64))
+        lo = np.searchsorted(self.keys, keys, "left")
+        counts = np.searchsorted(self.keys, keys, "right") - lo
+        total = counts.sum()
+        if not total:
+            return hits, distances
+        shots = np.repeat(np.arange(len(xs)), counts)
+        ends = np.cumsum(counts)
+        positions = np.arange(total) - np.repeat(ends - counts, counts) + np.repeat(lo, counts)
+        drones = self.entries[positions]
+        centers = self.predicted if predicted else self.current
+        dx = xs[shots] - centers[drones, 0]
+        dy = ys[shots] - centers[drones, 1]
+        inside = (np.abs(dx) < self.half_w) & (np.abs(dy) < self.half_h)
+        if not inside.any():
+            return hits, distances
+        shots, drones = shots[inside], drones[inside]
+        squared = dx[inside] ** 2 + dy[inside] ** 2
+        # Nearest candidate per shot: sort by shot then distance, keep the first.
+        order = np.lexsort((squared, shots))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = shots[order][1:] != shots[order][:-1]
+        chosen = order[first]
+        hits[shots[chosen]] = drones[chosen]
+        distances[shots[chosen]] = np.sqrt(squared[chosen])
+        return hits, distances
+
+    def nearest(self, x, y, predicted=False):
+        hits, distances = self.query([x], [y], predicted)
+        return int(hits[0]), float(distances[0])
+
+
+def cell_keys(x, y):
+    return ((y + CELL_OFFSET) << 32) | (x + CELL_OFFSET)
+
+
+def brute_force(xs, ys, centers, half_w, half_h):
+    # The old per-drone loop, for comparison.
+    results = []
+    for x, y in zip(xs, ys):
+        best, best_d = -1, np.inf
+        for i, (cx, cy) in enumerate(centers):
+            if abs(x - cx) < half_w and abs(y - cy) < half_h:
+                d = ((x - cx) ** 2 + (y - cy) ** 2) ** 0.5
+                if d < best_d:
+                    best, best_d = i, d
+        results.append(best)
+    return results
+
+
+def benchmark(drone_counts=(3, 100, 500, 2000), shots=64, frames=50, frame_size=(1280, 720), box=144):
+    # Builds the index for swarms of drones on a 1280x720 frame and resolves
+    # a burst of shots per frame, against the per-drone loop.
+    rng = np.random.default_rng(0)
+    frame_w, frame_h = frame_size
+    for count in drone_counts:
+        build_s = query_s = loop_s = 0.0
+        for _ in range(frames):
+            current = rng.uniform((0, 0), (frame_w, frame_h), (count, 2)).astype(int)
+            predicted = current + rng.integers(-40, 41, (count, 2))
+            xs = rng.integers(0, frame_w, shots)
+            ys = rng.integers(0, frame_h, shots)
+            start = time.perf_counter()
+            index = HitIndex(box, box)
+            index.build(current, predicted)
+            build_s += time.perf_counter() - start
+            start = time.perf_counter()
+            hits, _ = index.query(xs, ys)
+            query_s += time.perf_counter() - start
+            start = time.perf_counter()
+            expected = brute_force(xs.tolist(), ys.tolist(), current.tolist(), box // 2, box // 2)
+            loop_s += time.perf_counter() - start
+            assert hits.tolist() == expected
+        print(f"{count:5d} drones, {shots} shots per frame: index build {build_s / frames * 1000:.3f} ms + "
+              f"query {query_s / frames * 1000:.3f} ms, per-drone loop {loop_s / frames * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,240 @@
+import argparse
+import csv
+import json
+import platform
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from auto_calibration import AutoCalibrator, SimulatedTurret, TimedPin, find_laser_dot
+from servo import ServoChannel
+
+# capture: frame age when read; detect: detector time per frame; command:
+# request to pin write; actuation: pin write to the first frame showing the
+# effect; settle: pin write to the turret standing still; total: request to
+# the effect frame having been read and run through the detector.
+STAGES = ("capture", "detect", "command", "actuation", "settle", "total")
+SERVO_PINS = ("d:9:s", "d:10:s")
+LASER_PIN = "d:3:o"
+
+
+class ProbeCamera:
+    # Times every frame the probe reads: how old it is and how long the
+    # detector takes on it, as in the game's capture loop.
+    def __init__(self, camera, detect, samples):
+        self.camera = camera
+        self.detect = detect
+        self.samples = samples
+        self.done_at = {}
+
+    def read(self, timeout=1.0):
+        captured = self.camera.read(timeout)
+        if captured is None:
+            return None
+        self.samples["capture"].append(time.time() - captured.timestamp)
+        if self.detect is not None:
+            start = time.perf_counter()
+            self.detect(captured.image)
+            self.samples["detect"].append(time.perf_counter() - start)
+        self.done_at[captured.timestamp] = time.time()
+        return captured
+
+
+class LatencyProbe:
+    # Commands laser toggles and servo steps through ServoChannel and the
+    # Firmata pins and watches the camera for the visible effect. Servo steps
+    # alternate around center by step degrees with the laser on, so the dot
+    # shows where the turret points.
+    def __init__(self, camera, board, detect=None, rate_hz=50, center=(81, 66), step=(10, 6), timeout=1.0):
+        self.samples = {stage: [] for stage in STAGES}
+        self.pins = {spec: TimedPin(board.get_pin(spec)) for spec in SERVO_PINS + (LASER_PIN,)}
+        self.servo_channel = ServoChannel(self.pins[SERVO_PINS[0]], self.pins[SERVO_PINS[1]], self.pins[LASER_PIN],
+                                          rate_hz=rate_hz).start()
+        self.camera = ProbeCamera(camera, detect, self.samples)
+        self.calibrator = AutoCalibrator(self.camera, self.servo_channel, timeout=timeout)
+        self.targets = [(center[0] - step[0] // 2, center[1] - step[1] // 2),
+                        (center[0] + step[0] // 2, center[1] + step[1] // 2)]
+        self.timeout = timeout
+        self.failed = 0
+
+    def written_at(self, specs, since):
+        times = [at for spec in specs for at, _ in self.pins[spec].writes if at >= since]
+        return min(times) if times else None
+
+    def record(self, requested, written, seen_at, settled_at=None):
+        if written is None:
+            # The effect showed up without a write of ours (the pin already
+            # held that value), so there is nothing to time.
+            self.failed += 1
+            return
+        self.samples["command"].append(written - requested)
+        self.samples["actuation"].append(seen_at - written)
+        if settled_at is not None:
+            self.samples["settle"].append(settled_at - written)
+        self.samples["total"].append(self.camera.done_at[seen_at] - requested)
+        self.camera.done_at.clear()
+
+    def laser_trial(self):
+        self.calibrator.capture_background(frames=3)
+        requested = time.time()
+        self.servo_channel.set_laser(1)
+        while True:
+            captured = self.calibrator.read()
+            if captured.timestamp - requested > self.timeout:
+                self.failed += 1
+                return
+            if captured.timestamp >= requested and \
+                    find_laser_dot(captured.image, self.calibrator.background) is not None:
+                break
+        self.record(requested, self.written_at((LASER_PIN,), requested), captured.timestamp)
+
+    def servo_trials(self, trials):
+        # The first aim only puts the turret at a known position.
+        self.calibrator.capture_background()
+        self.servo_channel.set_laser(1)
+        result = self.calibrator.measure(*self.targets[0])
+        origin = result[0] if result else None
+        for i in range(trials):
+            result = self.calibrator.measure(*self.targets[(i + 1) % 2], origin)
+            if result is None:
+                self.failed += 1
+                origin = None
+                continue
+            origin, requested, moved_at, settled_at = result
+            self.record(requested, self.written_at(SERVO_PINS, requested), moved_at, settled_at)
+        self.servo_channel.set_laser(0)
+
+    def run(self, trials=30):
+        # Laser toggles are timed with the turret at the first step target.
+        self.servo_channel.aim(*self.targets[0])
+        time.sleep(0.5)
+        for _ in range(trials):
+            self.laser_trial()
+        self.servo_trials(trials)
+        self.servo_channel.set_laser(0)
+        self.servo_channel.stop()
+        return self.summary()
+
+    def summary(self):
+        return summarize(self.samples)
+
+
+def summarize(samples):
+    summary = {}
+    for stage in STAGES:
+        values = np.array(samples.get(stage, ()), dtype=np.float64) * 1000
+        if len(values):
+            p50, p90, p99 = np.percentile(values, (50, 90, 99))
+            summary[stage] = {"count": len(values), "mean_ms": float(values.mean()), "p50_ms": float(p50),
+                              "p90_ms": float(p90), "p99_ms": float(p99), "max_ms": float(values.max())}
+    return summary
+
+
+def format_summary(summary):
+    lines = [f"{'stage':<10}{'count':>7}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)"]
+    for stage, stats in summary.items():
+        lines.append(f"{stage:<10}{stats['count']:>7}{stats['mean_ms']:>9.1f}{stats['p50_ms']:>9.1f}"
+                     f"{stats['p90_ms']:>9.1f}{stats['p99_ms']:>9.1f}{stats['max_ms']:>9.1f}")
+    return "\n".join(lines)
+
+
+def export(path, samples, info):
+    # .csv: one row per sample; anything else: JSON with the setup, the
+    # summary and every sample.
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "seconds"])
+            for stage in STAGES:
+                writer.writerows((stage, value) for value in samples[stage])
+    else:
+        with open(path, "w") as f:
+            json.dump({"info": info, "summary": summarize(samples), "samples": samples}, f, indent=2)
+
+
+def compare(paths):
+    runs = []
+    for path in paths:
+        with open(path) as f:
+            runs.append(json.load(f))
+    lines = ["p50 / p90 ms: " + " | ".join(f"{i}: {run['info'].get('label') or path}"
+                                            for i, (run, path) in enumerate(zip(runs, paths)))]
+    for stage in STAGES:
+        cells = []
+        for run in runs:
+            stats = run["summary"].get(stage)
+            cells.append(f"{stats['p50_ms']:7.1f} / {stats['p90_ms']:7.1f}" if stats else f"{'-':>17}")
+        lines.append(f"{stage:<10}" + "   ".join(cells))
+    return "\n".join(lines)
+
+
+def apply_settle_time(summary, path="calibration_data.json"):
+    # Auto-aim leads by the calibration's settle_time plus the command
+    # latency ServoChannel measures while playing; both tools measure
+    # settle_time from the pin write so the two do not overlap.
+    with open(path) as f:
+        calibration_data = json.load(f)
+    calibration_data["settle_time"] = summary["settle"]["p90_ms"] / 1000
+    with open(path, "w") as f:
+        json.dump(calibration_data, f)
+    return calibration_data["settle_time"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure camera, detector, command and servo latency.")
+    parser.add_argument("--trials", type=int, default=30, help="laser toggles and servo steps to time")
+    parser.add_argument("--simulate", action="store_true", help="simulated turret, board and camera")
+    parser.add_argument("--detect-ms", type=float, default=20.0, help="stub detector cost when simulating")
+    parser.add_argument("--background", default="images/background2.jpg", help="scene for the simulated camera")
+    parser.add_argument("--center", type=int, nargs=2, metavar=("X", "Y"),
+                        help="servo angles to step around (default 81 66, 81 74 when simulating)")
+    parser.add_argument("--no-detect", action="store_true", help="leave the detector out of the loop")
+    parser.add_argument("--label", help="name for this setup in exports and comparisons")
+    parser.add_argument("--output", help="write samples to a .json or .csv file")
+    parser.add_argument("--apply", action="store_true", help="save the p90 settle time in calibration_data.json")
+    parser.add_argument("--compare", nargs="+", metavar="JSON", help="compare earlier exports and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print(compare(args.compare))
+        return
+
+    from config import load_config
+    config = load_config()
+    info = {"label": args.label, "time": datetime.now().isoformat(), "host": platform.node(),
+            "simulated": args.simulate, "board_port": config["board_port"],
+            "camera_source": config["camera_source"], "backend": config["backend"],
+            "inference_size": config["inference_size"], "servo_rate_hz": config["servo_rate_hz"]}
+    resources = None
+    center = args.center or ((81, 74) if args.simulate else (81, 66))
+    if args.simulate:
+        background = cv2.resize(cv2.imread(args.background), (1280, 720))
+        turret = SimulatedTurret(background, fps=60, camera_delay=0.03, write_latency=0.002)
+        camera = board = turret
+        detect = None if args.no_detect else lambda frame: time.sleep(args.detect_ms / 1000)
+        info["detect_ms"] = args.detect_ms
+    else:
+        from resources import Resources
+        resources = Resources(config)
+        camera, board = resources.camera(), resources.board()
+        detect = None if args.no_detect else resources.model()
+
+    try:
+        probe = LatencyProbe(camera, board, detect, rate_hz=config["servo_rate_hz"], center=center)
+        summary = probe.run(args.trials)
+    finally:
+        if resources is not None:
+            resources.close()
+    print(format_summary(summary))
+    if probe.failed:
+        print(f"{probe.failed} trials saw no effect within {probe.timeout:.1f} s")
+    if args.output:
+        export(args.output, probe.samples, info)
+    if args.apply and "settle" in summary:
+        print(f"auto-aim settle time set to {apply_settle_time(summary) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,9 @@
-import json
 import pygame
-import cv2
-import subprocess
 import tkinter as tk
 from tkinter import filedialog
 
+from results_store import open_results
+
 class DropDown():
     def __init__(self, color_menu, color_option, x, y, w, h, font, main, options):
         self.color_menu = color_menu
@@ -58,10 +57,11 @@ def draw_button(screen, text, x, y, width, height, color, hover_color, action=No
     mouse = pygame.mouse.get_pos()
     click = pygame.mouse.get_pressed()
     
+    result = None
     if x < mouse[0] < x + width and y < mouse[1] < y + height:
         pygame.draw.rect(screen, hover_color, (x, y, width, height))
         if click[0] == 1 and action is not None:
-            action()
+            result = action()
     else:
         pygame.draw.rect(screen, color, (x, y, width, height))
     
@@ -69,6 +69,7 @@ def draw_button(screen, text, x, y, width, height, color, hover_color, action=No
     text_surface = font.render(text, True, (0, 0, 0))
     text_rect = text_surface.get_rect(center=(x + width // 2, y + height // 2))
     screen.blit(text_surface, text_rect)
+    return result
 
 def draw_text(screen, text, x, y, color=(255, 255, 255)):
     font = pygame.font.Font(None, 36)
@@ -79,15 +80,10 @@ def start_game():
 
     with open("game_settings.txt", "w") as f:
         f.write(f"{difficulty_level}\n{num_drones}")
-    
-    pygame.quit()
-    subprocess.run(["python", "game.py"])
-    exit()
+    return "game"
 
 def calibrate():
-    pygame.quit()
-    subprocess.run(["python", "calibration.py"])
-    exit()
+    return "calibration"
 
 def change_background():
     root = tk.Tk()
@@ -97,17 +93,21 @@ def change_background():
         with open("background_config.txt", "w") as f:
             f.write(file_path)
         print("Фон гри змінено на", file_path)
-def view_stats():
-    try:
-        with open("game_results.json", "r") as f:
-            results = json.load(f)
-            stats_window = tk.Tk()
-            stats_window.title("Game Statistics")
-            text = tk.Text(stats_window, wrap='word')
-            text.insert(tk.END, json.dumps(results, indent=4))
-            text.pack(expand=True, fill='both')
-            stats_window.mainloop()
-    except FileNotFoundError:
+
+def show_stats():
+    return "stats"
+
+def view_stats(path="results.db"):
+    with open_results(path) as store:
+        report = store.report() if store.summary()["sessions"] else None
+    if report:
+        stats_window = tk.Tk()
+        stats_window.title("Game Statistics")
+        text = tk.Text(stats_window, wrap='word')
+        text.insert(tk.END, report)
+        text.pack(expand=True, fill='both')
+        stats_window.mainloop()
+    else:
         error_window = tk.Tk()
         error_window.title("Error")
         label = tk.Label(error_window, text="No game statistics available yet")
@@ -115,80 +115,91 @@ def view_stats():
         error_window.mainloop()
 
 def quit_game():
-    pygame.quit()
-    exit()
-
-pygame.init()
-screen = pygame.display.set_mode((1280, 720))
-pygame.display.set_caption("Меню")
-menu_background = pygame.image.load("D:/jammer/myGame/images/menu_background.jpg")
-menu_background = pygame.transform.scale(menu_background, (1280, 720))
-
+    return "quit"
 
 COLOR_INACTIVE = (100, 200, 255)
 COLOR_ACTIVE = (0, 150, 255)
 COLOR_LIST_INACTIVE = (200, 200, 200)
 COLOR_LIST_ACTIVE = (150, 150, 150)
 
-font = pygame.font.Font(None, 32)
-
-list_difficulty = DropDown(
-    [COLOR_INACTIVE, COLOR_ACTIVE],
-    [COLOR_LIST_INACTIVE, COLOR_LIST_ACTIVE],
-    490, 250, 300, 40, 
-    font,
-    "Виберіть рівень складності",
-    ["Легкий (повільний дрон)", 
-     "Середній (швидкий дрон)", 
-     "Складний (багато дронів)"]
-)
-
-
-list_drones = DropDown(
-    [COLOR_INACTIVE, COLOR_ACTIVE],
-    [COLOR_LIST_INACTIVE, COLOR_LIST_ACTIVE],
-    160, 250, 300, 40,  
-    font,
-    "Виберіть кількість дронів",
-    ["1", "2", "3", "4", "5"]
-)
-
 difficulty_level = 1
 num_drones = 1
+list_difficulty = None
+list_drones = None
+
+def run_menu(resources=None):
+    global difficulty_level, num_drones, list_difficulty, list_drones
+
+    pygame.init()
+    screen = pygame.display.set_mode((1280, 720))
+    pygame.display.set_caption("Меню")
+    menu_background = pygame.image.load("D:/jammer/myGame/images/menu_background.jpg")
+    menu_background = pygame.transform.scale(menu_background, (1280, 720))
+
+    font = pygame.font.Font(None, 32)
+
+    if list_difficulty is None:
+        list_difficulty = DropDown(
+            [COLOR_INACTIVE, COLOR_ACTIVE],
+            [COLOR_LIST_INACTIVE, COLOR_LIST_ACTIVE],
+            490, 250, 300, 40, 
+            font,
+            "Виберіть рівень складності",
+            ["Легкий (повільний дрон)", 
+             "Середній (швидкий дрон)", 
+             "Складний (багато дронів)"]
+        )
+
+        list_drones = DropDown(
+            [COLOR_INACTIVE, COLOR_ACTIVE],
+            [COLOR_LIST_INACTIVE, COLOR_LIST_ACTIVE],
+            160, 250, 300, 40,  
+            font,
+            "Виберіть кількість дронів",
+            ["1", "2", "3", "4", "5"]
+        )
+    list_difficulty.font = list_drones.font = font
+
+    choice = None
+    while choice is None:
+        event_list = pygame.event.get()
+        for event in event_list:
+            if event.type == pygame.QUIT:
+                choice = "quit"
 
-running = True
-while running:
-    event_list = pygame.event.get()
-    for event in event_list:
-        if event.type == pygame.QUIT:
-            running = False
-
-    screen.blit(menu_background, (0, 0))
-    
-   
-    selected_difficulty = list_difficulty.update(event_list)
-    if selected_difficulty >= 0:
-        difficulty_level = selected_difficulty + 1
-        list_difficulty.main = list_difficulty.options[selected_difficulty]
+        screen.blit(menu_background, (0, 0))
+        
+       
+        selected_difficulty = list_difficulty.update(event_list)
+        if selected_difficulty >= 0:
+            difficulty_level = selected_difficulty + 1
+            list_difficulty.main = list_difficulty.options[selected_difficulty]
 
-    selected_drones = list_drones.update(event_list)
-    if selected_drones >= 0:
-        num_drones = selected_drones + 1
-        list_drones.main = list_drones.options[selected_drones]
+        selected_drones = list_drones.update(event_list)
+        if selected_drones >= 0:
+            num_drones = selected_drones + 1
+            list_drones.main = list_drones.options[selected_drones]
 
-    
-    if difficulty_level == 3:
-        draw_text(screen, "Кількість дронів:", 160, 220)
-        list_drones.draw(screen)
+        
+        if difficulty_level == 3:
+            draw_text(screen, "Кількість дронів:", 160, 220)
+            list_drones.draw(screen)
 
-    list_difficulty.draw(screen)
-    
-    draw_button(screen, "Старт", 490, 400, 300, 60, (0, 0, 255), (0, 0, 200), start_game)
-    draw_button(screen, "Калібрування", 490, 480, 300, 60, (255, 255, 0), (200, 200, 0), calibrate)
-    draw_button(screen, "Змінити фон", 490, 560, 300, 60, (0, 150, 255), (0, 100, 200), change_background)
-    draw_button(screen, "Вихід", 490, 640, 300, 60, (255, 0, 0), (200, 0, 0), quit_game)
-    draw_button(screen, "Statistics", 20, 20, 300, 60, (0, 255, 0), (0, 200, 0), view_stats)
-    pygame.display.flip()
-
-pygame.quit()
-exit()
\ No newline at end of file
+        list_difficulty.draw(screen)
+        
+        choice = draw_button(screen, "Старт", 490, 400, 300, 60, (0, 0, 255), (0, 0, 200), start_game) or choice
+        choice = draw_button(screen, "Калібрування", 490, 480, 300, 60, (255, 255, 0), (200, 200, 0), calibrate) or choice
+        draw_button(screen, "Змінити фон", 490, 560, 300, 60, (0, 150, 255), (0, 100, 200), change_background)
+        choice = draw_button(screen, "Вихід", 490, 640, 300, 60, (255, 0, 0), (200, 0, 0), quit_game) or choice
+        choice = draw_button(screen, "Statistics", 20, 20, 300, 60, (0, 255, 0), (0, 200, 0), show_stats) or choice
+        if resources is not None:
+            status = "YOLO: ready" if resources.ready("model") else "YOLO: loading..."
+            draw_text(screen, status, 1060, 20)
+        pygame.display.flip()
+
+    pygame.display.quit()
+    return choice
+
+if __name__ == "__main__":
+    import app
+    app.main()
@@ -0,0 +1,130 @@
+import struct
+import time
+
+import cv2
+import numpy as np
+
+LOG_MAGIC = b"DHTL"
+
+
+class TimingLog:
+    # Streams one record per frame. A .csv path gives a text file; anything
+    # else gives a binary file: magic, stage names, then fixed-size records
+    # of (uint32 frame, float64 wall time, float32 ms per stage).
+    def __init__(self, path, names):
+        self.path = path
+        self.csv = path.endswith(".csv")
+        self.file = open(path, "w" if self.csv else "wb", buffering=1 << 16)
+        if self.csv:
+            self.file.write("frame,time," + ",".join(f"{name}_ms" for name in names) + "\n")
+        else:
+            header = ",".join(names).encode()
+            self.file.write(LOG_MAGIC + struct.pack("<H", len(header)) + header)
+            self.record = struct.Struct("<Id" + "f" * len(names))
+
+    def write(self, frame, wall_time, durations):
+        if self.csv:
+            self.file.write(f"{frame},{wall_time:.6f}," + ",".join(f"{d * 1000:.4f}" for d in durations) + "\n")
+        else:
+            self.file.write(self.record.pack(frame, wall_time, *(d * 1000 for d in durations)))
+
+    def close(self):
+        self.file.close()
+
+
+def read_timing_log(path):
+    with open(path, "rb") as f:
+        if f.read(4) != LOG_MAGIC:
+            raise ValueError(f"{path} is not a binary timing log")
+        (length,) = struct.unpack("<H", f.read(2))
+        names = f.read(length).decode().split(",")
+        dtype = np.dtype([("frame", "<u4"), ("time", "<f8")] + [(name, "<f4") for name in names])
+        return np.fromfile(f, dtype=dtype)
+
+
+class StageTimer:
+    # Lap timer for the stages of one frame: start_frame() then lap(stage)
+    # after each stage records the time spent since the previous mark.
+    # With history set, only the last `history` frames are kept, in a ring.
+    def __init__(self, stages, history=None, log_path=None):
+        self.stages = list(stages)
+        self.names = self.stages + ["total"]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.history = history
+        self.current = [0.0] * len(self.names)
+        self.rows = [] if history is None else np.zeros((history, len(self.names)))
+        self.frames = 0
+        self.log = TimingLog(log_path, self.names) if log_path else None
+        self._frame_start = 0.0
+        self._last = 0.0
+
+    def start_frame(self):
+        self._frame_start = self._last = time.perf_counter()
+        self.current[:] = [0.0] * len(self.names)
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.current[self.index[stage]] = now - self._last
+        self._last = now
+
+    def end_frame(self):
+        self.current[-1] = time.perf_counter() - self._frame_start
+        if self.history is None:
+            self.rows.append(tuple(self.current))
+        else:
+            self.rows[self.frames % self.history] = self.current
+        if self.log is not None:
+            self.log.write(self.frames, time.time(), self.current)
+        self.frames += 1
+
+    def window(self):
+        if self.history is None:
+            return np.array(self.rows).reshape(-1, len(self.names))
+        return self.rows[:min(self.frames, self.history)]
+
+    def percentiles(self, stage, quantiles=(50, 95, 99)):
+        samples = self.window()[:, self.index[stage]]
+        if not len(samples):
+            return [0.0] * len(quantiles)
+        return (np.percentile(samples, quantiles) * 1000).tolist()
+
+    def histogram(self, stage, bins_ms=(0.5, 1, 2, 4, 8, 16, 33, 66, 133)):
+        samples = self.window()[:, self.index[stage]] * 1000
+        edges = np.concatenate([[0.0], bins_ms, [np.inf]])
+        return np.histogram(samples, edges)[0]
+
+    def report(self, quantiles=(50, 95, 99)):
+        header = f"{'stage':<10}" + "".join(f"{'p' + str(q) + ' ms':>10}" for q in quantiles)
+        lines = [header]
+        for stage in self.names:
+            values = self.percentiles(stage, quantiles)
+            lines.append(f"{stage:<10}" + "".join(f"{value:>10.3f}" for value in values))
+        return "\n".join(lines)
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+
+def draw_profiler(frame, timer, fps, x=None, y=10, width=330, bar_ms=33.0):
+    # Per-stage mean and p95 in ms over the timer's window, with bars scaled
+    # so a full bar is one 30 FPS frame.
+    window = timer.window()
+    if not len(window):
+        return
+    means = window.mean(axis=0) * 1000
+    p95 = np.percentile(window, 95, axis=0) * 1000
+    line_h = 22
+    height = line_h * (len(timer.names) + 1) + 10
+    x = frame.shape[1] - width - 10 if x is None else x
+    panel = frame[y:y + height, x:x + width]
+    panel //= 3
+    cv2.putText(frame, f"FPS {fps:.1f}", (x + 8, y + line_h),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 255, 255), 1)
+    for i, name in enumerate(timer.names):
+        row_y = y + line_h * (i + 2)
+        bar = int(min(1.0, means[i] / bar_ms) * 90)
+        cv2.rectangle(frame, (x + width - 98, row_y - 12), (x + width - 98 + bar, row_y - 2), (0, 200, 255), -1)
+        for text, offset in ((name, 8), (f"{means[i]:.2f}", 90), (f"p95 {p95[i]:.2f}", 150)):
+            cv2.putText(frame, text, (x + offset, row_y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
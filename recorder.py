@@ -0,0 +1,224 @@
+import json
+import struct
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from detector import Detection
+from input_events import EVENT_KINDS, InputEvent
+
+RECORD_MAGIC = b"DHRC"
+RECORD_VERSION = 3
+
+# frame id, now, frame size, crosshair, flags, servo angles, servo and laser
+# latency, score, shots fired
+FRAME = struct.Struct("<IdHHhhBBBddII")
+COUNT = struct.Struct("<H")
+# time, kind, x, y, key
+EVENT = struct.Struct("<dBhhi")
+DETECTION = struct.Struct("<idH")
+
+FLAGS = ("auto_aim", "use_background", "no_drone_period", "laser_on", "drone_active", "quit_by_user")
+
+FrameRecord = namedtuple("FrameRecord", ["frame_id", "now", "frame_w", "frame_h", "crosshair_x", "crosshair_y",
+                                         "flags", "servo_x", "servo_y", "latency", "laser_latency", "score",
+                                         "shots_fired", "events", "drones", "detection"])
+
+
+class Recorder:
+    # Streams one compact binary record per frame (the input events the
+    # engine applied, game state, drone state, detections, servo commands) to an append-only log, and optionally
+    # the camera frames to a video file. The render loop only packs bytes and
+    # copies the frame into a free buffer; a background thread does all the
+    # file and video writes. Video frames are dropped rather than waited for
+    # when every buffer is still queued.
+    def __init__(self, path, video_path=None, video_fps=30, video_buffers=8, flush_interval=0.1):
+        self.path = path
+        self.video_path = video_path
+        self.video_fps = video_fps
+        self.flush_interval = flush_interval
+        self.file = open(path, "wb")
+        self.frames = 0
+        self.video_dropped = 0
+        self._buffers = [None] * (video_buffers if video_path else 0)
+        self._free = list(range(len(self._buffers)))
+        self._video = None
+        self._chunks = []
+        self._queued_frames = []
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def start(self, engine):
+        header = {
+            "version": RECORD_VERSION,
+            "start_time": engine.now,
+            "seed": engine.seed,
+            "difficulty_level": engine.difficulty_level,
+            "num_drones": engine.num_drones,
+            "drone_size": [engine.drone_w, engine.drone_h],
+            "config": engine.config,
+            "calibration": engine.servo_map.to_dict(),
+            "settle_time": engine.settle_time,
+            "video_path": self.video_path,
+        }
+        data = json.dumps(header).encode()
+        self._append(RECORD_MAGIC + struct.pack("<HI", RECORD_VERSION, len(data)) + data)
+
+    def record_frame(self, engine, source, detection):
+        movement = engine.drone_movement
+        state = (engine.auto_aim, engine.use_background, movement.no_drone_period, engine.laser_on,
+                 engine.drone_active, engine.quit_by_user)
+        flags = sum(1 << i for i, on in enumerate(state) if on)
+        drones = np.column_stack([movement.x, movement.y, movement.angle, movement.speed]).astype(np.float32)
+        events = engine.frame_events
+        parts = [
+            FRAME.pack(engine.frame_id, engine.now, engine.frame_w, engine.frame_h, engine.crosshair_x,
+                       engine.crosshair_y, flags, engine.servo_command[0], engine.servo_command[1],
+                       engine.servo_latency, engine.laser_latency, engine.score, engine.shots_fired),
+            COUNT.pack(len(events)),
+            b"".join(EVENT.pack(event.time, EVENT_KINDS.index(event.kind), event.x, event.y, event.key)
+                     for event in events),
+            COUNT.pack(len(drones)), drones.tobytes(),
+            DETECTION.pack(detection.frame_id, detection.timestamp, len(detection.scores)),
+            np.column_stack([detection.boxes, detection.scores]).astype(np.float32).tobytes(),
+        ]
+        payload = b"".join(parts)
+        self._append(struct.pack("<I", len(payload)) + payload)
+        self.frames += 1
+        if self._buffers:
+            self._queue_video(source)
+
+    def _append(self, chunk):
+        with self._cond:
+            self._chunks.append(chunk)
+
+    def _queue_video(self, image):
+        with self._cond:
+            if not self._free:
+                self.video_dropped += 1
+                return
+            slot = self._free.pop()
+        buffer = self._buffers[slot]
+        if buffer is None or buffer.shape != image.shape:
+            buffer = self._buffers[slot] = np.empty_like(image)
+        np.copyto(buffer, image)
+        with self._cond:
+            self._queued_frames.append(slot)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._running and not self._queued_frames:
+                    self._cond.wait(self.flush_interval)
+                chunks, self._chunks = self._chunks, []
+                slots, self._queued_frames = self._queued_frames, []
+                running = self._running
+            if chunks:
+                self.file.write(b"".join(chunks))
+            for slot in slots:
+                image = self._buffers[slot]
+                if self._video is None:
+                    self._video = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*"mp4v"), self.video_fps,
+                                                  (image.shape[1], image.shape[0]))
+                self._video.write(image)
+                with self._cond:
+                    self._free.append(slot)
+            if not running:
+                return
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join()
+        self.file.close()
+        if self._video is not None:
+            self._video.release()
+
+
+def read_recording(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != RECORD_MAGIC:
+        raise ValueError(f"{path} is not a session recording")
+    version, length = struct.unpack_from("<HI", data, 4)
+    if version != RECORD_VERSION:
+        raise ValueError(f"{path} has recording version {version}, expected {RECORD_VERSION}")
+    offset = 10 + length
+    header = json.loads(data[10:offset])
+    frames = []
+    while offset + 4 <= len(data):
+        (size,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        if offset + size > len(data):
+            break  # cut short by a crash; keep what was complete
+        frames.append(parse_frame(data, offset))
+        offset += size
+    return header, frames
+
+
+def parse_frame(data, offset):
+    values = FRAME.unpack_from(data, offset)
+    offset += FRAME.size
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    events = []
+    for _ in range(count):
+        at, kind, x, y, key = EVENT.unpack_from(data, offset)
+        events.append(InputEvent(at, EVENT_KINDS[kind], x, y, key))
+        offset += EVENT.size
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    drones = np.frombuffer(data, np.float32, count * 4, offset).reshape(count, 4)
+    offset += count * 16
+    frame_id, stamp, count = DETECTION.unpack_from(data, offset)
+    offset += DETECTION.size
+    boxes = np.frombuffer(data, np.float32, count * 5, offset).reshape(count, 5)
+    flags = {name for i, name in enumerate(FLAGS) if values[6] & (1 << i)}
+    return FrameRecord(*values[:6], flags, *values[7:], events, drones,
+                       Detection(boxes[:, :4].copy(), boxes[:, 4].copy(), frame_id, stamp))
+
+
+def benchmark(frames=2000, video_frames=150):
+    # Cost of record_frame on the caller's thread for a three-drone frame,
+    # without video as fast as possible, and with video at 30 FPS.
+    from types import SimpleNamespace
+    import os
+    import tempfile
+    engine = SimpleNamespace(seed=0, difficulty_level=1, num_drones=3, drone_w=144, drone_h=144, config={},
+                             servo_map=SimpleNamespace(to_dict=dict), settle_time=0.1, frame_id=0, now=0.0, frame_w=1280, frame_h=720, crosshair_x=640, crosshair_y=360,
+                             auto_aim=True, use_background=False, laser_on=0, drone_active=True, quit_by_user=False,
+                             frame_events=[], servo_command=(90, 70), servo_latency=0.01, laser_latency=0.002, score=3, shots_fired=9,
+                             drone_movement=SimpleNamespace(x=np.zeros(3), y=np.zeros(3), angle=np.zeros(3),
+                                                            speed=np.zeros(3), no_drone_period=False))
+    detection = Detection(np.zeros((3, 4), np.float32), np.ones(3, np.float32), 0, 0.0)
+    image = np.zeros((720, 1280, 3), np.uint8)
+    folder = tempfile.mkdtemp()
+    for video, count in ((None, frames), (os.path.join(folder, "session.mp4"), video_frames)):
+        recorder = Recorder(os.path.join(folder, "session.dhr"), video)
+        recorder.start(engine)
+        spent = 0.0
+        for i in range(count):
+            engine.frame_id = i
+            engine.frame_events = [InputEvent(i / 30, "move", i % 1280, i % 720, -1)]
+            start = time.perf_counter()
+            recorder.record_frame(engine, image, detection)
+            spent += time.perf_counter() - start
+            if video:
+                time.sleep(1 / 30)
+        recorder.close()
+        size = os.path.getsize(recorder.path)
+        print(f"{'with' if video else 'without'} video: {spent / count * 1e6:.1f} us per frame on the render thread, "
+              f"{size / count:.0f} bytes per frame, {recorder.video_dropped} video frames dropped")
+    header, records = read_recording(os.path.join(folder, "session.dhr"))
+    print(f"read back {len(records)} frames")
+
+
+if __name__ == "__main__":
+    benchmark()
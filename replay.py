@@ -0,0 +1,173 @@
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from capture import CapturedFrame
+from compositing import load_sprite
+from display import NullSound
+from engine import GameEngine
+from recorder import read_recording
+from servo import MockBoard
+
+
+class ReplayDisplay:
+    # Plays back the recorded input: each frame's events are pushed with
+    # their original timestamps just before the engine drains the queue.
+    def __init__(self, session, window_name=None):
+        self.session = session
+        self.window_name = window_name
+        self.events = None
+
+    def attach(self, events):
+        self.events = events
+
+    def poll(self):
+        for event in self.session.record.events:
+            self.events.push(event.kind, event.x, event.y, event.key, at=event.time)
+
+    def show(self, frame):
+        if self.window_name:
+            cv2.imshow(self.window_name, frame)
+            cv2.waitKey(1)
+
+    def close(self):
+        if self.window_name:
+            cv2.destroyWindow(self.window_name)
+
+
+class ReplayDetector:
+    def __init__(self, session):
+        self.session = session
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+    def ready(self):
+        return True
+
+    def submit(self, frame, frame_id, regions=None, now=None):
+        return False
+
+    def latest(self):
+        return self.session.record.detection
+
+    def fps(self):
+        return 0.0
+
+
+class ReplaySource:
+    # Frames from the session's video side-file when there is one, otherwise
+    # the background image. The game logic does not depend on pixels.
+    def __init__(self, session, background, video_path=None):
+        self.session = session
+        self.background = background
+        self.capture = cv2.VideoCapture(video_path) if video_path and os.path.exists(video_path) else None
+
+    def read(self, timeout=None):
+        image = self.background
+        if self.capture is not None:
+            ok, frame = self.capture.read()
+            if ok:
+                image = frame
+        return CapturedFrame(image, self.session.index, self.session.record.now, 0)
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+
+
+class ReplayEngine(GameEngine):
+    # Uses the recorded servo and laser latency so auto-aim leads exactly as
+    # it did live.
+    def __init__(self, session, *args, **kwargs):
+        self.session = session
+        super().__init__(*args, **kwargs)
+
+    def read_servo_latency(self):
+        return self.session.record.latency
+
+    def read_laser_latency(self):
+        return self.session.record.laser_latency
+
+
+class ReplaySession:
+    # Re-runs a recorded session through GameEngine with no camera, model,
+    # board or window. The engine clock returns the recorded frame times and
+    # DroneMovement is re-seeded from the header, so drones, shots and score
+    # follow the recording frame for frame.
+    def __init__(self, path, background_path=None, use_video=False, window_name=None):
+        self.header, self.records = read_recording(path)
+        self.index = 0
+        self.record = None
+        header = self.header
+        config = dict(header["config"], seed=header["seed"], timing_log=None, profiler_overlay=False)
+        drone_w, drone_h = header["drone_size"]
+        drone_rgb, drone_alpha = load_sprite(config["drone_image_path"], scale=0.4)
+        if drone_rgb is None or drone_rgb.shape[:2] != (drone_h, drone_w):
+            drone_rgb = np.zeros((drone_h, drone_w, 3), dtype=np.uint8)
+            drone_alpha = np.zeros((drone_h, drone_w), dtype=np.float32)
+        frame_w, frame_h = (self.records[0].frame_w, self.records[0].frame_h) if self.records else (1280, 720)
+        background = cv2.imread(background_path) if background_path else None
+        if background is None:
+            background = np.full((frame_h, frame_w, 3), 64, dtype=np.uint8)
+        background = cv2.resize(background, (frame_w, frame_h))
+
+        self.source = ReplaySource(self, background, header["video_path"] if use_video else None)
+        # Until the first frame the clock reads the time the session started.
+        self.engine = ReplayEngine(self, config, header["difficulty_level"], header["num_drones"],
+                                   {"model": header["calibration"], "settle_time": header["settle_time"]}, drone_rgb, drone_alpha, background, self.source,
+                                   ReplayDetector(self), MockBoard(), ReplayDisplay(self, window_name), NullSound(),
+                                   clock=self.clock)
+        self.mismatches = []
+
+    def clock(self):
+        return self.record.now if self.record is not None else self.header["start_time"]
+
+    def run(self):
+        engine = self.engine
+        for self.index, self.record in enumerate(self.records):
+            running = engine.step()
+            movement = engine.drone_movement
+            if ((engine.score, engine.shots_fired) != (self.record.score, self.record.shots_fired) or
+                    not np.allclose(movement.x, self.record.drones[:, 0], atol=0.01) or
+                    not np.allclose(movement.y, self.record.drones[:, 1], atol=0.01)):
+                self.mismatches.append((self.index, engine.score, self.record.score))
+            if not running:
+                break
+        engine.close()
+        self.source.release()
+        return engine.results()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded session without camera, model or Arduino.")
+    parser.add_argument("recording")
+    parser.add_argument("--background", help="background image to render on (pixels do not affect the game)")
+    parser.add_argument("--video", action="store_true", help="render on the recorded camera video")
+    parser.add_argument("--show", action="store_true", help="show the replayed frames in a window")
+    args = parser.parse_args(argv)
+
+    session = ReplaySession(args.recording, args.background, args.video, "Replay" if args.show else None)
+    start = time.perf_counter()
+    score, shots_fired, accuracy_list, duration = session.run()[:4]
+    elapsed = time.perf_counter() - start
+    print(f"{len(session.records)} frames, {duration:.1f} s of play replayed in {elapsed:.2f} s "
+          f"({duration / max(elapsed, 1e-9):.0f}x real time)")
+    print(f"score {score}, shots fired {shots_fired}, mean accuracy "
+          f"{np.mean(accuracy_list) if accuracy_list else 0:.1f}%")
+    if session.mismatches:
+        index, replayed, recorded = session.mismatches[0]
+        print(f"{len(session.mismatches)} frames differ from the recording, first at frame {index} "
+              f"(score {replayed} vs {recorded})")
+    else:
+        print("replay matches the recording")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import threading
+import time
+
+from backends import ExportedDetector, TorchDetector, export_model
+from capture import FrameGrabber
+from detector import RoiDetector
+from servo import SharedBoard, open_board
+
+
+class Resources:
+    # Heavy, long-lived objects shared by every scene of the app: the YOLO
+    # model, the camera and the Arduino. Each one is created on first use, or
+    # ahead of time by warm_up() on a background thread, and then reused.
+    # started is the perf_counter() value the startup report is relative to.
+    def __init__(self, config, started=None):
+        self.config = config
+        self.started = time.perf_counter() if started is None else started
+        self.timings = []
+        self.device = None
+        self._lock = threading.Lock()
+        self._loading = {}
+        self._values = {}
+        self._errors = {}
+
+    def _get(self, name, factory):
+        with self._lock:
+            if name in self._values:
+                return self._values[name]
+            event = self._loading.get(name)
+            owner = event is None
+            if owner:
+                event = self._loading[name] = threading.Event()
+        if not owner:
+            event.wait()
+            if name in self._errors:
+                raise self._errors[name]
+            return self._values[name]
+        try:
+            value = factory()
+        except Exception as e:
+            with self._lock:
+                self._errors[name] = e
+                del self._loading[name]
+            event.set()
+            raise
+        with self._lock:
+            self._values[name] = value
+        event.set()
+        return value
+
+    def ready(self, name):
+        return name in self._values
+
+    def record(self, name, start, end=None):
+        # Startup steps are recorded once; later games reuse the resources.
+        if any(name == recorded for recorded, _, _ in self.timings):
+            return False
+        end = time.perf_counter() if end is None else end
+        self.timings.append((name, start - self.started, end - start))
+        return True
+
+    def _timed(self, name, fn, *args):
+        start = time.perf_counter()
+        value = fn(*args)
+        self.record(name, start)
+        return value
+
+    def startup_report(self):
+        lines = [f"{'startup':<22}{'at s':>8}{'took s':>8}"]
+        for name, at, took in sorted(self.timings, key=lambda t: t[1]):
+            lines.append(f"{name:<22}{at:>8.2f}{took:>8.2f}")
+        return "\n".join(lines)
+
+    def on_ready(self, name, callback):
+        # Calls callback(resource) from a background thread once it is loaded,
+        # so scenes can start without waiting for it.
+        def load():
+            try:
+                value = getattr(self, name)()
+            except Exception as e:
+                print(f"Failed to load {name}:", e)
+                return
+            callback(value)
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
+
+    def model(self):
+        return self._get("model", self._load_model)
+
+    def camera(self):
+        return self._get("camera", self._open_camera)
+
+    def board(self):
+        return self._get("board", lambda: SharedBoard(self._timed("open board", open_board, self.config["board_port"])))
+
+    def sound(self):
+        return self._get("sound", self._load_sound)
+
+    def warm_up(self, names=("board", "camera", "model")):
+        def load():
+            for name in names:
+                try:
+                    getattr(self, name)()
+                except Exception as e:
+                    print(f"Failed to load {name}:", e)
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
+
+    def _pick_device(self):
+        device = self.config["device"]
+        if device != "auto":
+            return device
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+
+    def _load_model(self):
+        # Returns a detect function frame -> (boxes, scores). The first
+        # inference builds kernels and allocates buffers, so it is run here on
+        # a blank frame instead of on the first game frame.
+        config = self.config
+        backend, size = config["backend"], config["inference_size"]
+        if backend == "torch":
+            YOLO = self._timed("import ultralytics", lambda: __import__("ultralytics").YOLO)
+            model = self._timed("load model", YOLO, config["model_path"])
+            self.device = self._timed("pick device", self._pick_device)
+            self._timed(f"model to {self.device}", model.to, self.device)
+            detect = TorchDetector(model, size)
+            if config["roi_detection"]:
+                detect = RoiDetector(detect, TorchDetector(model, config["roi_size"]), config["roi_size"],
+                                     config["roi_full_every"], config["roi_min_score"])
+        else:
+            detect = self._load_exported(backend, size)
+            if config["roi_detection"]:
+                detect = RoiDetector(detect, self._load_exported(backend, config["roi_size"]), config["roi_size"],
+                                     config["roi_full_every"], config["roi_min_score"])
+            self.device = "cpu"
+        if config["warmup"]:
+            import numpy as np
+            blank = np.zeros((720, 1280, 3), dtype=np.uint8)
+            self._timed("warm-up inference", detect, blank)
+            if config["roi_detection"]:
+                self._timed("warm-up crop inference", detect.crop_detect.detect_crops, blank, [(0, 0)],
+                            config["roi_size"])
+        return detect
+
+    def _load_exported(self, backend, size):
+        config = self.config
+        path = self._timed(f"export {backend} {size}", export_model, config["model_path"], backend, size,
+                           config["int8"], config["model_cache_dir"])
+        return self._timed(f"load {backend} {size}", ExportedDetector, path, backend, size)
+
+    def _open_camera(self):
+        camera = self._timed("open camera", FrameGrabber(self.config["camera_source"], 1280, 720).start)
+        if not camera.is_opened():
+            raise RuntimeError("Failed to open the camera")
+        return camera
+
+    def _load_sound(self):
+        import pygame
+        pygame.mixer.init()
+        return pygame.mixer.Sound(self.config["sound_path"])
+
+    def close(self):
+        if self.ready("camera"):
+            self._values["camera"].release()
+        if self.ready("board"):
+            self._values["board"].exit()
@@ -0,0 +1,304 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+# Reaction times are kept per daily row as int32 counts in 25 ms bins (the
+# last bin collects everything slower), so percentiles never need the
+# individual shots.
+REACTION_BIN = 0.025
+REACTION_BINS = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    operator TEXT NOT NULL,
+    station TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    day TEXT NOT NULL,
+    difficulty INTEGER NOT NULL,
+    num_drones INTEGER NOT NULL,
+    auto_aim INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    shots_fired INTEGER NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_operator ON sessions (operator, started_at);
+CREATE INDEX IF NOT EXISTS sessions_day ON sessions (day);
+CREATE INDEX IF NOT EXISTS sessions_difficulty ON sessions (difficulty, day);
+
+CREATE TABLE IF NOT EXISTS shots (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    time REAL NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    hit INTEGER NOT NULL,
+    accuracy REAL NOT NULL,
+    zone TEXT,
+    auto_aim INTEGER NOT NULL,
+    reaction_time REAL
+);
+CREATE INDEX IF NOT EXISTS shots_session ON shots (session_id);
+
+CREATE TABLE IF NOT EXISTS daily (
+    operator TEXT NOT NULL,
+    day TEXT NOT NULL,
+    difficulty INTEGER NOT NULL,
+    auto_aim INTEGER NOT NULL,
+    sessions INTEGER NOT NULL,
+    shots INTEGER NOT NULL,
+    hits INTEGER NOT NULL,
+    accuracy_sum REAL NOT NULL,
+    accuracy_count INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    reaction BLOB,
+    PRIMARY KEY (operator, day, difficulty, auto_aim)
+);
+CREATE INDEX IF NOT EXISTS daily_day ON daily (day);
+"""
+
+
+class ResultsStore:
+    # Append-only history of games and shots in SQLite. Each add_session()
+    # also folds the game into per-day aggregates (one row per operator, day,
+    # difficulty and auto-aim mode, with a reaction-time histogram), so
+    # summary() and trend() read a few rows per day instead of every shot.
+    def __init__(self, path="results.db"):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def add_session(self, score, shots_fired, accuracy_list, game_duration, difficulty_level, num_drones, auto_aim,
+                    shots=(), operator="", station=None, started_at=None):
+        # The first seven arguments are GameEngine.results(). shots: dicts with
+        # time, x, y, hit, accuracy, zone, auto_aim and reaction_time (None
+        # when no drone was on screen); without them hits and accuracy come
+        # from score and accuracy_list.
+        started_at = started_at or datetime.now().isoformat()
+        day = started_at[:10]
+        station = station or socket.gethostname()
+        auto_aim = int(bool(auto_aim))
+        key = (operator, day, difficulty_level, auto_aim)
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT INTO sessions (operator, station, started_at, day, difficulty, num_drones, auto_aim, score,"
+                " shots_fired, duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (operator, station, started_at, day, difficulty_level, num_drones, auto_aim, score, shots_fired,
+                 game_duration))
+            session_id = cursor.lastrowid
+            self.db.executemany(
+                "INSERT INTO shots (session_id, time, x, y, hit, accuracy, zone, auto_aim, reaction_time)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(session_id, s["time"], s["x"], s["y"], int(s["hit"]), s["accuracy"], s["zone"],
+                  int(bool(s["auto_aim"])), s["reaction_time"]) for s in shots])
+
+            hits = [s for s in shots if s["hit"]] if shots else []
+            accuracies = [s["accuracy"] for s in hits if s["accuracy"] > 0] if shots else \
+                [accuracy for accuracy in accuracy_list if accuracy > 0]
+            reactions = [s["reaction_time"] for s in shots if s["reaction_time"] is not None]
+            histogram = np.bincount(np.minimum((np.asarray(reactions) / REACTION_BIN).astype(int), REACTION_BINS - 1),
+                                    minlength=REACTION_BINS).astype(np.int32)
+            row = self.db.execute("SELECT reaction FROM daily WHERE operator = ? AND day = ? AND difficulty = ?"
+                                  " AND auto_aim = ?", key).fetchone()
+            if row is not None and row[0] is not None:
+                histogram += np.frombuffer(row[0], np.int32)
+            self.db.execute(
+                "INSERT INTO daily VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (operator, day, difficulty, auto_aim) DO UPDATE SET"
+                " sessions = sessions + 1, shots = shots + excluded.shots, hits = hits + excluded.hits,"
+                " accuracy_sum = accuracy_sum + excluded.accuracy_sum,"
+                " accuracy_count = accuracy_count + excluded.accuracy_count,"
+                " duration = duration + excluded.duration, reaction = excluded.reaction",
+                key + (len(shots) if shots else shots_fired, len(hits) if shots else score, sum(accuracies),
+                       len(accuracies), game_duration, histogram.tobytes()))
+        return session_id
+
+    def import_json(self, path):
+        # The single-game game_results.json written by older versions.
+        with open(path) as f:
+            results = json.load(f)
+        self.add_session(results["score"], results["shots_fired"], results["accuracy_list"], results["game_duration"],
+                         results["difficulty_level"], results["num_drones"], results["auto_aim"],
+                         started_at=results["timestamp"])
+
+    def _where(self, operator=None, difficulty=None, auto_aim=None, since=None, until=None):
+        clauses, args = [], []
+        for column, value in (("operator", operator), ("difficulty", difficulty), ("auto_aim", auto_aim)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(int(value) if column == "auto_aim" else value)
+        if since is not None:
+            clauses.append("day >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("day <= ?")
+            args.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def summary(self, quantiles=(50, 90, 99), **filters):
+        # filters: operator, difficulty, auto_aim, since/until ("YYYY-MM-DD").
+        where, args = self._where(**filters)
+        sessions = shots = hits = accuracy_sum = accuracy_count = duration = 0
+        histogram = np.zeros(REACTION_BINS, dtype=np.int64)
+        for row in self.db.execute("SELECT sessions, shots, hits, accuracy_sum, accuracy_count, duration, reaction"
+                                   " FROM daily" + where, args):
+            sessions += row[0]
+            shots += row[1]
+            hits += row[2]
+            accuracy_sum += row[3]
+            accuracy_count += row[4]
+            duration += row[5]
+            if row[6] is not None:
+                histogram += np.frombuffer(row[6], np.int32)
+        return {
+            "sessions": sessions,
+            "shots": shots,
+            "hits": hits,
+            "hit_rate": hits / shots if shots else 0.0,
+            "mean_accuracy": accuracy_sum / accuracy_count if accuracy_count else 0.0,
+            "play_time": duration,
+            "reaction_time": dict(zip(quantiles, histogram_percentiles(histogram, quantiles))),
+        }
+
+    def trend(self, **filters):
+        # Per-day (day, sessions, shots, hit rate, mean accuracy).
+        where, args = self._where(**filters)
+        rows = self.db.execute(
+            "SELECT day, SUM(sessions), SUM(shots), SUM(hits), SUM(accuracy_sum), SUM(accuracy_count) FROM daily"
+            + where + " GROUP BY day ORDER BY day", args)
+        return [(day, sessions, shots, hits / shots if shots else 0.0, acc_sum / acc_count if acc_count else 0.0)
+                for day, sessions, shots, hits, acc_sum, acc_count in rows]
+
+    def recent_sessions(self, limit=20, operator=None, since=None):
+        where, args = self._where(operator=operator, since=since)
+        return self.db.execute(
+            "SELECT started_at, operator, difficulty, num_drones, auto_aim, score, shots_fired, duration"
+            " FROM sessions" + where + " ORDER BY id DESC LIMIT ?", args + [limit]).fetchall()
+
+    def report(self, days=None, **filters):
+        # days limits every section to games from the last days days;
+        # without it the totals cover all games and the trend the last 14
+        # days played.
+        if days is not None:
+            filters["since"] = (date.today() - timedelta(days=days - 1)).isoformat()
+        lines = []
+        total = self.summary(**filters)
+        reaction = ", ".join(f"p{q} {value * 1000:.0f} ms" for q, value in total["reaction_time"].items())
+        lines.append(f"{total['sessions']} games, {total['shots']} shots, {total['hits']} hits "
+                     f"({total['hit_rate'] * 100:.1f}%), mean accuracy {total['mean_accuracy']:.1f}%, "
+                     f"{total['play_time'] / 60:.0f} min played")
+        lines.append(f"Reaction time: {reaction}")
+        lines.append("")
+        lines.append("By difficulty:")
+        for difficulty in (1, 2, 3):
+            stats = self.summary(**dict(filters, difficulty=difficulty))
+            if stats["sessions"]:
+                lines.append(f"  level {difficulty}: {stats['sessions']} games, hit rate {stats['hit_rate'] * 100:.1f}%,"
+                             f" accuracy {stats['mean_accuracy']:.1f}%")
+        lines.append("")
+        lines.append(f"Last {days} days:" if days is not None else "Last 14 days played:")
+        for day, sessions, shots, hit_rate, accuracy in self.trend(**filters)[-(days or 14):]:
+            lines.append(f"  {day}: {sessions} games, {shots} shots, hit rate {hit_rate * 100:.1f}%,"
+                         f" accuracy {accuracy:.1f}%")
+        lines.append("")
+        lines.append("Recent games:")
+        for started_at, operator, difficulty, num_drones, auto_aim, score, shots_fired, duration in \
+                self.recent_sessions(10, filters.get("operator"), filters.get("since")):
+            lines.append(f"  {started_at[:16].replace('T', ' ')} {operator or '-'}: level {difficulty}, "
+                         f"{num_drones} drones, auto-aim {'on' if auto_aim else 'off'}, score {score}, "
+                         f"{duration:.0f} s")
+        return "\n".join(lines)
+
+
+def histogram_percentiles(histogram, quantiles):
+    # Upper edge of the bin holding each percentile, in seconds.
+    total = histogram.sum()
+    if not total:
+        return [0.0] * len(quantiles)
+    cumulative = np.cumsum(histogram)
+    return [float((np.searchsorted(cumulative, total * q / 100) + 1) * REACTION_BIN) for q in quantiles]
+
+
+def open_results(path="results.db", legacy_json="game_results.json"):
+    # Imports the old single-game JSON the first time the database is made.
+    new = not os.path.exists(path)
+    store = ResultsStore(path)
+    if new and legacy_json and os.path.exists(legacy_json):
+        store.import_json(legacy_json)
+    return store
+
+
+def benchmark(sessions=3000, shots_per_session=100):
+    # Fills a fresh database with sessions * shots_per_session shots, then
+    # compares summary() on the aggregates with a scan over every shot.
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), "results.db")
+    rng = np.random.default_rng(0)
+    operators = [f"operator{i}" for i in range(20)]
+    start = time.perf_counter()
+    with ResultsStore(path) as store:
+        for i in range(sessions):
+            hits = rng.random(shots_per_session) < 0.4
+            shots = [{"time": float(t), "x": 640, "y": 360, "hit": bool(hit), "accuracy": 80.0 if hit else 0.0,
+                      "zone": "safe", "auto_aim": False, "reaction_time": float(reaction)}
+                     for t, hit, reaction in zip(np.arange(shots_per_session), hits,
+                                                 rng.gamma(4, 0.1, shots_per_session))]
+            day = f"2025-{1 + i * 12 // sessions:02d}-{1 + i % 28:02d}T12:00:00"
+            store.add_session(int(hits.sum()), shots_per_session, [], 60.0, 1 + i % 3, 3, False, shots,
+                              operator=operators[i % len(operators)], started_at=day)
+        fill_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        summary = store.summary(operator="operator3", difficulty=2)
+        store.trend(operator="operator3")
+        store.summary()
+        query_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        store.db.execute("SELECT COUNT(*), SUM(hit), AVG(CASE WHEN hit THEN accuracy END) FROM shots").fetchone()
+        reactions = [r for (r,) in store.db.execute("SELECT reaction_time FROM shots")]
+        np.percentile(reactions, (50, 90, 99))
+        scan_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{sessions * shots_per_session} shots in {sessions} sessions stored in {fill_s:.1f} s "
+          f"({fill_s / sessions * 1000:.2f} ms per session)")
+    print(f"summary + trend + overall summary from aggregates: {query_ms:.1f} ms; "
+          f"one full scan of the shots table: {scan_ms:.1f} ms")
+    print(f"operator3, level 2: {summary['sessions']} games, hit rate {summary['hit_rate'] * 100:.1f}%, "
+          f"reaction p50 {summary['reaction_time'][50] * 1000:.0f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print statistics from the game results database.")
+    parser.add_argument("path", nargs="?", default="results.db")
+    parser.add_argument("--operator")
+    parser.add_argument("--difficulty", type=int)
+    parser.add_argument("--days", type=int, help="only games from the last DAYS days")
+    parser.add_argument("--benchmark", action="store_true", help="time inserts and queries on a synthetic database")
+    args = parser.parse_args(argv)
+    if args.benchmark:
+        benchmark()
+        return
+    with open_results(args.path) as store:
+        print(store.report(args.days, operator=args.operator, difficulty=args.difficulty))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import heapq
+import itertools
+import time
+
+
+class Scheduler:
+    # Timed callbacks driven from the main loop: run_pending() is called once
+    # per frame and fires everything that is due. Nothing here ever sleeps.
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.now = clock()
+        self._queue = []
+        self._counter = itertools.count()
+
+    def call_at(self, when, callback, *args):
+        entry = [when, next(self._counter), callback, args]
+        heapq.heappush(self._queue, entry)
+        return entry
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.now + delay, callback, *args)
+
+    def cancel(self, entry):
+        if entry is not None:
+            entry[2] = None
+
+    def run_pending(self, now=None):
+        self.now = self.clock() if now is None else now
+        while self._queue and self._queue[0][0] <= self.now:
+            _, _, callback, args = heapq.heappop(self._queue)
+            if callback is not None:
+                callback(*args)
+
+
+class LaserController:
+    # Fires laser pulses of pulse_width seconds separated by cooldown seconds.
+    # Shots requested while a pulse or cooldown is running are queued, up to
+    # max_queued pending shots.
+    def __init__(self, scheduler, write, pulse_width=0.25, cooldown=0.25, max_queued=3):
+        self.scheduler = scheduler
+        self.write = write
+        self.pulse_width = pulse_width
+        self.cooldown = cooldown
+        self.max_queued = max_queued
+        self.pending = 0
+        self.ready_at = 0.0
+
+    def fire(self, on_fire=None):
+        if self.pending >= self.max_queued:
+            return False
+        start = max(self.scheduler.now, self.ready_at)
+        self.ready_at = start + self.pulse_width + self.cooldown
+        self.pending += 1
+        self.scheduler.call_at(start, self._pulse_on, on_fire)
+        return True
+
+    def reloading(self):
+        return self.scheduler.now < self.ready_at
+
+    def _pulse_on(self, on_fire):
+        self.write(1)
+        self.scheduler.call_later(self.pulse_width, self._pulse_off)
+        if on_fire is not None:
+            on_fire()
+
+    def _pulse_off(self):
+        self.write(0)
+        self.pending -= 1
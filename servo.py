@@ -0,0 +1,196 @@
+import threading
+import time
+
+
+class MockPin:
+    def __init__(self, spec, write_latency=0.0):
+        self.spec = spec
+        self.write_latency = write_latency
+        self.value = None
+        self.writes = []
+
+    def write(self, value):
+        if self.write_latency:
+            time.sleep(self.write_latency)
+        self.value = value
+        self.writes.append((time.monotonic(), value))
+
+
+class MockBoard:
+    # Stands in for pyfirmata.Arduino; write_latency approximates the time a
+    # Firmata message spends on the serial link.
+    def __init__(self, port="mock", write_latency=0.0):
+        self.port = port
+        self.write_latency = write_latency
+        self.pins = {}
+
+    def get_pin(self, spec):
+        if spec not in self.pins:
+            self.pins[spec] = MockPin(spec, self.write_latency)
+        return self.pins[spec]
+
+    def exit(self):
+        pass
+
+
+class SharedBoard:
+    # Firmata pins can only be claimed once per connection, so the board is
+    # shared between scenes through this cache of claimed pins.
+    def __init__(self, board):
+        self.board = board
+        self.pins = {}
+
+    def get_pin(self, spec):
+        if spec not in self.pins:
+            self.pins[spec] = self.board.get_pin(spec)
+        return self.pins[spec]
+
+    def exit(self):
+        self.board.exit()
+
+
+def open_board(port):
+    if port == "mock":
+        return MockBoard()
+    from pyfirmata import Arduino
+    return Arduino(port)
+
+
+class ServoChannel:
+    # Sends servo and laser commands from a background thread. aim() only
+    # stores the latest target; the thread sends it at most rate_hz times a
+    # second and skips angles that did not change. Laser writes are sent in
+    # order as soon as possible.
+    def __init__(self, servo_x, servo_y, laser_pin=None, rate_hz=50):
+        self.servo_x = servo_x
+        self.servo_y = servo_y
+        self.laser_pin = laser_pin
+        self.period = 1.0 / rate_hz if rate_hz else 0.0
+        self.sent = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.latency = 0.0
+        self.laser_latency = 0.0
+        self._cond = threading.Condition()
+        self._target = None
+        self._requested_at = 0.0
+        self._laser = []
+        self._last = (None, None)
+        self._next_send = 0.0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self._flush()
+
+    def aim(self, angle_x, angle_y):
+        with self._cond:
+            if self._target is not None:
+                self.coalesced += 1
+            else:
+                self._requested_at = time.monotonic()
+            self._target = (angle_x, angle_y)
+            self._cond.notify()
+
+    def set_laser(self, value):
+        with self._cond:
+            self._laser.append((value, time.monotonic()))
+            self._cond.notify()
+
+    def _take(self):
+        laser, self._laser = self._laser, []
+        target = None
+        if self._target is not None and time.monotonic() >= self._next_send:
+            target, self._target = self._target, None
+        return laser, target, self._requested_at
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._laser:
+                    if self._target is not None:
+                        delay = self._next_send - time.monotonic()
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+                if not self._running:
+                    return
+                laser, target, requested_at = self._take()
+            self._send(laser, target, requested_at)
+
+    def _flush(self):
+        with self._cond:
+            self._next_send = 0.0
+            laser, target, requested_at = self._take()
+        self._send(laser, target, requested_at)
+
+    def _send(self, laser, target, requested_at):
+        for value, laser_requested_at in laser:
+            self.laser_pin.write(value)
+            self.laser_latency += 0.1 * ((time.monotonic() - laser_requested_at) - self.laser_latency)
+        if target is None:
+            return
+        if target == self._last:
+            self.skipped += 1
+            return
+        if target[0] != self._last[0]:
+            self.servo_x.write(target[0])
+        if target[1] != self._last[1]:
+            self.servo_y.write(target[1])
+        self._last = target
+        now = time.monotonic()
+        self._next_send = now + self.period
+        self.latency += 0.1 * ((now - requested_at) - self.latency)
+        self.sent += 1
+
+
+def benchmark(duration=2.0, event_hz=500, rate_hz=50, write_latency=0.001):
+    # Replays a stream of mouse-move aims against a mock board, once with
+    # direct pin writes (as game.py used to do) and once through ServoChannel.
+    steps = int(duration * event_hz)
+    angles = [(60 + (i // 7) % 40, 60 + (i // 11) % 20) for i in range(steps)]
+
+    board = MockBoard(write_latency=write_latency)
+    servo_x, servo_y = board.get_pin('d:9:s'), board.get_pin('d:10:s')
+    start = time.perf_counter()
+    for angle_x, angle_y in angles:
+        servo_x.write(angle_x)
+        servo_y.write(angle_y)
+    direct_ms = (time.perf_counter() - start) * 1000
+    direct_writes = len(servo_x.writes) + len(servo_y.writes)
+
+    board = MockBoard(write_latency=write_latency)
+    servo_x, servo_y = board.get_pin('d:9:s'), board.get_pin('d:10:s')
+    channel = ServoChannel(servo_x, servo_y, rate_hz=rate_hz).start()
+    start = time.perf_counter()
+    caller_s = 0.0
+    for angle_x, angle_y in angles:
+        call = time.perf_counter()
+        channel.aim(angle_x, angle_y)
+        caller_s += time.perf_counter() - call
+        time.sleep(1.0 / event_hz)
+    channel.stop()
+    channel_writes = len(servo_x.writes) + len(servo_y.writes)
+
+    print(f"{steps} aim requests at {event_hz} Hz, {write_latency * 1000:.1f} ms per serial write")
+    print(f"  direct writes:  {direct_writes} writes, {direct_ms:.1f} ms blocking the caller")
+    print(f"  ServoChannel:   {channel_writes} writes, {caller_s * 1000:.1f} ms blocking the caller")
+    print(f"                  sent={channel.sent} coalesced={channel.coalesced} skipped={channel.skipped} "
+          f"latency={channel.latency * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,163 @@
+import json
+import time
+
+import cv2
+import numpy as np
+
+KINDS = ("affine", "homography", "poly2")
+
+
+def map_angle(value, left_min, left_max, right_min, right_max):
+    # The old mapping: linear between the extreme calibration angles.
+    value = max(left_min, min(value, left_max))
+    left_span = left_max - left_min
+    right_span = right_max - right_min
+    value_scaled = float(value - left_min) / float(left_span)
+    return round(right_min + (value_scaled * right_span))
+
+
+def affine_terms(u, v):
+    return np.stack([np.ones_like(u), u, v], axis=-1)
+
+
+def poly2_terms(u, v):
+    return np.stack([np.ones_like(u), u, v, u * v, u * u, v * v], axis=-1)
+
+
+TERMS = {"affine": affine_terms, "poly2": poly2_terms}
+
+
+class ServoMap:
+    # Screen pixel -> (servo_x, servo_y) fitted by least squares to every
+    # calibration point. Pixels are normalised to 0..1 by the calibration
+    # frame size before fitting. angles() looks the result up in a dense
+    # per-pixel table built once per frame size.
+    def __init__(self, kind, coeffs, frame_w, frame_h, angle_min, angle_max):
+        self.kind = kind
+        self.coeffs = np.asarray(coeffs, dtype=np.float64)
+        self.frame_w = frame_w
+        self.frame_h = frame_h
+        self.angle_min = np.asarray(angle_min, dtype=np.float64)
+        self.angle_max = np.asarray(angle_max, dtype=np.float64)
+        self.lut = None
+        self.lut_size = None
+        self.build_lut(frame_w, frame_h)
+
+    @classmethod
+    def fit(cls, points, frame_w, frame_h, kind="auto"):
+        screen = np.array([p["screen_pos"] for p in points], dtype=np.float64) / (frame_w, frame_h)
+        angles = np.array([(p["servo_x"], p["servo_y"]) for p in points], dtype=np.float64)
+        if kind == "auto":
+            kind = "poly2" if len(points) >= 9 else "homography" if len(points) >= 4 else "affine"
+        needed = {"affine": 3, "homography": 4, "poly2": 6}[kind]
+        if len(points) < needed:
+            raise ValueError(f"{kind} needs at least {needed} calibration points, got {len(points)}")
+        if kind == "homography":
+            # Method 0 is a plain least-squares fit over all points.
+            coeffs, _ = cv2.findHomography(screen, angles, 0)
+            if coeffs is None:
+                raise ValueError("calibration points are degenerate")
+        else:
+            coeffs = np.linalg.lstsq(TERMS[kind](*screen.T), angles, rcond=None)[0]
+        return cls(kind, coeffs, frame_w, frame_h, angles.min(axis=0), angles.max(axis=0))
+
+    @classmethod
+    def from_calibration(cls, calibration_data):
+        model = calibration_data.get("model")
+        if model is not None:
+            return cls.from_dict(model)
+        return cls.fit(calibration_data["points"], calibration_data["frame_width"], calibration_data["frame_height"])
+
+    def predict(self, x, y):
+        # Unclamped float angles for pixel coordinates (scalars or arrays).
+        u = np.asarray(x, dtype=np.float64) / self.frame_w
+        v = np.asarray(y, dtype=np.float64) / self.frame_h
+        if self.kind == "homography":
+            h = self.coeffs
+            w = h[2, 0] * u + h[2, 1] * v + h[2, 2]
+            return np.stack([(h[0, 0] * u + h[0, 1] * v + h[0, 2]) / w,
+                             (h[1, 0] * u + h[1, 1] * v + h[1, 2]) / w], axis=-1)
+        return TERMS[self.kind](u, v) @ self.coeffs
+
+    def residuals(self, points):
+        screen = np.array([p["screen_pos"] for p in points], dtype=np.float64)
+        angles = np.array([(p["servo_x"], p["servo_y"]) for p in points], dtype=np.float64)
+        return np.hypot(*(self.predict(screen[:, 0], screen[:, 1]) - angles).T)
+
+    def report(self, points):
+        errors = self.residuals(points)
+        lines = [f"{self.kind} fit over {len(points)} points: rms {np.sqrt(np.mean(errors ** 2)):.2f} deg, "
+                 f"max {errors.max():.2f} deg"]
+        for p, error in zip(points, errors):
+            lines.append(f"  {tuple(p['screen_pos'])}: {error:.2f} deg")
+        return "\n".join(lines)
+
+    def build_lut(self, width, height):
+        # Rounded, clamped angles for every pixel of a width x height frame;
+        # other frame sizes are scaled onto the calibration frame.
+        xs = (np.arange(width) + 0.5) * self.frame_w / width
+        ys = (np.arange(height) + 0.5) * self.frame_h / height
+        grid_x, grid_y = np.meshgrid(xs, ys)
+        angles = np.rint(self.predict(grid_x, grid_y)).clip(self.angle_min, self.angle_max).astype(np.uint16)
+        # Both angles packed into one uint16 so a lookup is a single item().
+        self.lut = (angles[..., 0] << 8) | angles[..., 1]
+        self.lut_size = (width, height)
+        return self.lut
+
+    def angles(self, x, y):
+        # Servo angles for a pixel of the frame size of the last build_lut().
+        width, height = self.lut_size
+        packed = self.lut.item(min(max(int(y), 0), height - 1), min(max(int(x), 0), width - 1))
+        return packed >> 8, packed & 0xFF
+
+    def to_dict(self):
+        return {"kind": self.kind, "coeffs": self.coeffs.tolist(), "frame_width": self.frame_w,
+                "frame_height": self.frame_h, "angle_min": self.angle_min.tolist(),
+                "angle_max": self.angle_max.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["kind"], data["coeffs"], data["frame_width"], data["frame_height"],
+                   data["angle_min"], data["angle_max"])
+
+
+def benchmark(filename="calibration_data.json", lookups=100000):
+    # Fits every model kind to the saved calibration and compares lookup
+    # cost with the old min/max map_angle.
+    with open(filename) as f:
+        data = json.load(f)
+    points, frame_w, frame_h = data["points"], data["frame_width"], data["frame_height"]
+    rng = np.random.default_rng(0)
+    xs = rng.integers(0, frame_w, lookups).tolist()
+    ys = rng.integers(0, frame_h, lookups).tolist()
+
+    range_x = (min(p["servo_x"] for p in points), max(p["servo_x"] for p in points))
+    range_y = (min(p["servo_y"] for p in points), max(p["servo_y"] for p in points))
+    start = time.perf_counter()
+    for x, y in zip(xs, ys):
+        map_angle(x, 0, frame_w, *range_x), map_angle(y, 0, frame_h, *range_y)
+    legacy_us = (time.perf_counter() - start) / lookups * 1e6
+    legacy = [(map_angle(p["screen_pos"][0], 0, frame_w, *range_x), map_angle(p["screen_pos"][1], 0, frame_h, *range_y))
+              for p in points]
+    legacy_err = np.hypot(*(np.array(legacy) - [(p["servo_x"], p["servo_y"]) for p in points]).T)
+    print(f"map_angle (min/max): rms {np.sqrt(np.mean(legacy_err ** 2)):.2f} deg, {legacy_us:.2f} us per lookup")
+
+    for kind in KINDS:
+        try:
+            servo_map = ServoMap.fit(points, frame_w, frame_h, kind)
+        except ValueError as e:
+            print(f"{kind}: {e}")
+            continue
+        start = time.perf_counter()
+        servo_map.build_lut(frame_w, frame_h)
+        build_ms = (time.perf_counter() - start) * 1000
+        angles = servo_map.angles
+        start = time.perf_counter()
+        for x, y in zip(xs, ys):
+            angles(x, y)
+        lookup_us = (time.perf_counter() - start) / lookups * 1e6
+        print(servo_map.report(points).splitlines()[0] + f", LUT built in {build_ms:.1f} ms, {lookup_us:.2f} us per lookup")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,157 @@
+import itertools
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+
+def greedy_assignment(cost):
+    rows, cols = [], []
+    used_rows, used_cols = set(), set()
+    for index in np.argsort(cost, axis=None):
+        row, col = divmod(int(index), cost.shape[1])
+        if row in used_rows or col in used_cols:
+            continue
+        rows.append(row)
+        cols.append(col)
+        used_rows.add(row)
+        used_cols.add(col)
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+
+def iou(box, boxes):
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+class Track:
+    # Constant-velocity Kalman filter over the box center (x, y, vx, vy);
+    # the box size is smoothed separately.
+    def __init__(self, track_id, box, score, now, process_noise=500.0, measurement_noise=25.0):
+        cx, cy = (box[0] + box[2]) / 2, (box[1] + box[3]) / 2
+        self.id = track_id
+        self.state = np.array([cx, cy, 0.0, 0.0])
+        self.covariance = np.diag([measurement_noise, measurement_noise, 1e4, 1e4])
+        self.size = np.array([box[2] - box[0], box[3] - box[1]], dtype=float)
+        self.score = float(score)
+        self.hits = 1
+        self.misses = 0
+        self.last_time = now
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+
+    def predict(self, now):
+        dt = now - self.last_time
+        if dt <= 0:
+            return
+        transition = np.eye(4)
+        transition[0, 2] = transition[1, 3] = dt
+        q = self.process_noise
+        noise = np.diag([q * dt ** 3 / 3, q * dt ** 3 / 3, q * dt, q * dt])
+        self.state = transition @ self.state
+        self.covariance = transition @ self.covariance @ transition.T + noise
+        self.last_time = now
+
+    def correct(self, box, score):
+        measurement = np.array([(box[0] + box[2]) / 2, (box[1] + box[3]) / 2])
+        residual = measurement - self.state[:2]
+        innovation = self.covariance[:2, :2] + np.eye(2) * self.measurement_noise
+        gain = self.covariance[:, :2] @ np.linalg.inv(innovation)
+        self.state = self.state + gain @ residual
+        self.covariance = self.covariance - gain @ self.covariance[:2, :]
+        self.size += 0.3 * (np.array([box[2] - box[0], box[3] - box[1]]) - self.size)
+        self.score = float(score)
+        self.hits += 1
+        self.misses = 0
+
+    def center(self, at=None):
+        if at is None:
+            return self.state[:2].copy()
+        return self.state[:2] + self.state[2:] * (at - self.last_time)
+
+    def velocity(self):
+        return self.state[2:].copy()
+
+    def box(self, at=None):
+        cx, cy = self.center(at)
+        w, h = self.size / 2
+        return np.array([cx - w, cy - h, cx + w, cy + h])
+
+
+class MultiTracker:
+    # Associates detector boxes with tracks by IoU (Hungarian matching when
+    # scipy is available, greedy otherwise). Between detections callers query
+    # track.center(at) to extrapolate along the velocity estimate.
+    def __init__(self, min_iou=0.1, max_distance=150.0, min_hits=2, max_misses=5):
+        self.min_iou = min_iou
+        self.max_distance = max_distance
+        self.min_hits = min_hits
+        self.max_misses = max_misses
+        self.tracks = []
+        self.last_frame_id = -1
+        self._ids = itertools.count(1)
+
+    def update(self, boxes, scores, now, frame_id=None):
+        if frame_id is not None:
+            if frame_id == self.last_frame_id:
+                return self.confirmed()
+            self.last_frame_id = frame_id
+
+        for track in self.tracks:
+            track.predict(now)
+
+        unmatched = set(range(len(boxes)))
+        if self.tracks and len(boxes):
+            predicted = np.array([track.box() for track in self.tracks])
+            cost = np.empty((len(self.tracks), len(boxes)))
+            for i, box in enumerate(predicted):
+                cost[i] = 1.0 - iou(box, boxes)
+            centers = np.column_stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2])
+            track_centers = (predicted[:, :2] + predicted[:, 2:]) / 2
+            distance = np.linalg.norm(track_centers[:, None, :] - centers[None, :, :], axis=2)
+            # Boxes that do not overlap yet are still matched by distance, so
+            # fast drones and sparse detection do not break the track.
+            cost = np.where(cost < 1.0, cost, 1.0 + distance / self.max_distance)
+
+            assign = linear_sum_assignment if linear_sum_assignment is not None else greedy_assignment
+            rows, cols = assign(cost)
+            matched = set()
+            for row, col in zip(rows, cols):
+                if cost[row, col] > 1.0 - self.min_iou and distance[row, col] > self.max_distance:
+                    continue
+                self.tracks[row].correct(boxes[col], scores[col])
+                matched.add(row)
+                unmatched.discard(col)
+            for i, track in enumerate(self.tracks):
+                if i not in matched:
+                    track.misses += 1
+        else:
+            for track in self.tracks:
+                track.misses += 1
+
+        for col in sorted(unmatched):
+            self.tracks.append(Track(next(self._ids), boxes[col], scores[col], now))
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        return self.confirmed()
+
+    def confirmed(self):
+        return [track for track in self.tracks if track.hits >= self.min_hits]
+
+    def best_target(self, aim_x, aim_y, now):
+        # Prefer fresh, confident tracks close to the current aim point.
+        best, best_cost = None, None
+        for track in self.confirmed():
+            cx, cy = track.center(now)
+            cost = np.hypot(cx - aim_x, cy - aim_y) * (1 + track.misses) / max(track.score, 0.05)
+            if best_cost is None or cost < best_cost:
+                best, best_cost = track, cost
+        return best